@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+
+# Upper bounds (in days, exclusive) of the age buckets; the last bucket is open-ended.
+AGE_BUCKET_DAYS: tuple[int, ...] = (30, 90, 180, 365, 730)
+AGE_BUCKET_LABELS: tuple[str, ...] = ("<30d", "30-90d", "90-180d", "180d-1y", "1-2y", ">2y")
+AGE_BUCKET_COLORS: tuple[str, ...] = (
+    "bright_green",
+    "green",
+    "yellow",
+    "dark_orange",
+    "red",
+    "magenta",
+)
+AGE_BUCKET_COUNT = len(AGE_BUCKET_DAYS) + 1
+
+_DAY_S = 86400.0
+
+
+def age_days(mtime: float, now: float) -> float:
+    return max(0.0, (now - mtime) / _DAY_S)
+
+
+def age_bucket(mtime: float, now: float) -> int:
+    return bisect_right(AGE_BUCKET_DAYS, age_days(mtime, now))
+
+
+def first_bucket_at_least(days: float) -> int:
+    """Index of the first bucket that can hold files at least `days` old."""
+
+    return bisect_right(AGE_BUCKET_DAYS, days)
@@ -1,18 +1,34 @@
 from __future__ import annotations
 
-import time
+import contextlib
 from enum import Enum
 from pathlib import Path
 
 import typer
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from typer.core import TyperGroup
 
-from .render import RenderConfig, build_report
-from .scan import ScanConfig, scan_path
-from .tui import MezDiskApp, TuiConfig
+from .events import ScanFinished, ScanProgress
+from .owners import OwnerFilter, resolve_gid, resolve_uid
+from .scan import ScanConfig, deepen_scan, iter_scan, scan_path
+from .throttle import lower_priority
+from .util import format_bytes
 
-app = typer.Typer(add_completion=False, no_args_is_help=True)
+# Rich's console/layout machinery, Textual and anything only one mode needs (sampling,
+# the server client, ...) are imported where they are used: `mezdisk --help` and
+# scripted runs should not pay for what they never run. tests/test_startup.py keeps
+# it that way.
+
+
+class _DefaultScanGroup(TyperGroup):
+    """Treat `mezdisk PATH ...` as `mezdisk scan PATH ...` so subcommands stay optional."""
+
+    def parse_args(self, ctx: typer.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ("--help", "-h"):
+            args = ["scan", *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(cls=_DefaultScanGroup, add_completion=False, no_args_is_help=True)
 
 
 class UiMode(str, Enum):
@@ -20,7 +36,7 @@ class UiMode(str, Enum):
     rich = "rich"
 
 
-@app.command()
+@app.command("scan")
 def main(
     path: Path = typer.Argument(Path("."), help="Path to scan (file or directory)."),
     ui: UiMode = typer.Option(UiMode.textual, help="UI mode: textual (interactive) or rich."),
@@ -29,23 +45,77 @@ def main(
     ),
     tree_depth: int = typer.Option(4, help="Depth shown in the Rich tree panel."),
     follow_symlinks: bool = typer.Option(False, help="Follow symlinks (can loop)."),
+    deadline: float | None = typer.Option(
+        None, help="Stop scanning after this many seconds and show the partial result."
+    ),
+    max_entries: int | None = typer.Option(
+        None, help="Stop scanning after this many entries and show the partial result."
+    ),
+    max_ops: float | None = typer.Option(
+        None,
+        min=1,
+        help="Cap directory listings + stats per second; backs off further while I/O is slow.",
+    ),
+    low_priority: bool = typer.Option(
+        False, help="Run at the lowest CPU priority and (Linux) the idle I/O class."
+    ),
+    deepen: bool = typer.Option(
+        False, help="Scan shallow first, then deepen the largest subtrees first."
+    ),
+    estimate: bool = typer.Option(
+        False, help="Estimate sizes by sampling subdirectories below --estimate-depth."
+    ),
+    estimate_depth: int = typer.Option(2, help="Levels listed exactly in --estimate mode."),
+    estimate_samples: int = typer.Option(
+        8, help="Subdirectories scanned per directory in --estimate mode (more = tighter)."
+    ),
+    confidence: float = typer.Option(
+        0.95, min=0.5, max=0.999, help="Confidence level of --estimate intervals."
+    ),
     treemap_height: int = typer.Option(18, help="Height of treemap panel in rows."),
     treemap_items: int = typer.Option(25, help="Number of items in treemap."),
+    color_by_age: bool = typer.Option(
+        False, help="Colour the treemap by file age (mtime) instead of file type."
+    ),
+    cold_days: int = typer.Option(
+        180, help="Age in days for the 'largest not modified' (cold data) table."
+    ),
+    owner: str | None = typer.Option(
+        None, help="Only show files owned by this user (name or uid) in treemap/tables."
+    ),
+    group: str | None = typer.Option(
+        None, help="Only show files owned by this group (name or gid) in treemap/tables."
+    ),
+    connect: Path | None = typer.Option(
+        None, help="Use the scan held by a `mezdisk serve` socket instead of scanning."
+    ),
+    save_snapshot: Path | None = typer.Option(
+        None, help="Also write the scan result as JSON (for `mezdisk query --snapshot`)."
+    ),
 ) -> None:
     """Scan disk usage and render a WinDirStat-ish UI."""
 
+    from rich.console import Console
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
     console = Console()
     root_path = path.expanduser().resolve()
 
-    last_update = 0.0
+    if deepen and estimate:
+        raise typer.BadParameter("--deepen and --estimate cannot be combined.")
 
-    def on_visit(p: Path) -> None:
-        nonlocal last_update
-        now = time.monotonic()
-        if now - last_update < 0.05:
-            return
-        last_update = now
-        progress.update(task_id, description=f"Scanning: {p}")
+    owner_filter = None
+    if owner is not None or group is not None:
+        try:
+            owner_filter = OwnerFilter(
+                uid=resolve_uid(owner) if owner is not None else None,
+                gid=resolve_gid(group) if group is not None else None,
+            )
+        except ValueError as exc:
+            raise typer.BadParameter(str(exc)) from exc
+
+    if low_priority:
+        _lower_priority()
 
     with Progress(
         SpinnerColumn(),
@@ -54,26 +124,214 @@ def main(
         transient=True,
     ) as progress:
         task_id = progress.add_task("Starting...", total=None)
-        result = scan_path(
-            root_path,
-            ScanConfig(max_depth=max_depth, follow_symlinks=follow_symlinks, on_visit=on_visit),
+        scan_config = ScanConfig(
+            max_depth=max_depth,
+            follow_symlinks=follow_symlinks,
+            deadline_s=deadline,
+            max_entries=max_entries,
+            max_ops_per_s=max_ops,
         )
+        if connect is not None:
+            from .client import ScanClient, ServerError
+
+            progress.update(task_id, description=f"Fetching scan from {connect}")
+            try:
+                with ScanClient(connect) as client:
+                    result = client.fetch_result()
+            except (OSError, ServerError) as exc:
+                raise typer.BadParameter(f"cannot use {connect}: {exc}") from exc
+            root_path = result.root.path
+        elif estimate:
+            from .estimate import EstimateConfig, estimate_path
+
+            progress.update(task_id, description=f"Estimating: {root_path}")
+            result = estimate_path(
+                root_path,
+                scan_config,
+                EstimateConfig(
+                    exact_depth=estimate_depth,
+                    samples=estimate_samples,
+                    confidence=confidence,
+                ),
+            )
+        elif deepen:
+            for partial in deepen_scan(root_path, scan_config):
+                result = partial
+                progress.update(
+                    task_id,
+                    description=f"Deepening: {format_bytes(result.root.size_bytes)} so far",
+                )
+        else:
+            for event in iter_scan(root_path, scan_config, file_events=False):
+                if isinstance(event, ScanProgress):
+                    rate = f"{event.entries_per_s:,.0f}/s"
+                    if event.limit_per_s is not None:
+                        rate += f" of {event.limit_per_s:,.0f}/s"
+                    progress.update(
+                        task_id,
+                        description=f"Scanning ({event.entries} entries, {rate}): {event.current}",
+                    )
+                elif isinstance(event, ScanFinished):
+                    result = event.result
+
+    if save_snapshot is not None:
+        import json
+
+        from .snapshot import result_to_dict
+
+        save_snapshot.write_text(json.dumps(result_to_dict(result), separators=(",", ":")))
+
+    from .mounts import reconcile
+
+    # Only when the scan root is a mount point; costs one statvfs.
+    reconciliation = reconcile(result)
 
     if ui == UiMode.textual:
+        from .tui import MezDiskApp, TuiConfig
+
         MezDiskApp(
             result=result,
             root_path=root_path,
-            config=TuiConfig(treemap_height=treemap_height, treemap_items=treemap_items),
+            config=TuiConfig(
+                treemap_height=treemap_height,
+                treemap_items=treemap_items,
+                cold_days=cold_days,
+                color_by_age=color_by_age,
+                owner=owner_filter,
+            ),
+            scan_config=scan_config,
+            reconciliation=reconciliation,
         ).run()
         return
 
+    from .render import RenderConfig, build_report
+
     config = RenderConfig(
         tree_depth=tree_depth,
         treemap_height=treemap_height,
         treemap_items=treemap_items,
+        color_by_age=color_by_age,
+        cold_days=cold_days,
+        owner=owner_filter,
+    )
+
+    console.print(
+        build_report(result, root_path=root_path, config=config, reconciliation=reconciliation)
     )
 
-    console.print(build_report(result, root_path=root_path, config=config))
+
+@app.command()
+def mounts(
+    all_filesystems: bool = typer.Option(
+        False, "--all", help="Include kernel/virtual filesystems (proc, sysfs, ...)."
+    ),
+) -> None:
+    """Show used/free space of every mounted filesystem, fullest first (no scan)."""
+
+    from rich.console import Console
+
+    from .mounts import list_filesystems
+    from .render import build_filesystems_table
+
+    Console().print(build_filesystems_table(list_filesystems(include_pseudo=all_filesystems)))
+
+
+@app.command()
+def query(
+    expr: str = typer.Argument(..., help="Query, e.g. 'ext:log size>1G age>30d under:/srv'."),
+    path: Path = typer.Argument(
+        Path("."), help="Path to scan (ignored with --snapshot/--connect)."
+    ),
+    snapshot: Path | None = typer.Option(
+        None, help="Query a JSON scan saved with `mezdisk scan --save-snapshot`."
+    ),
+    connect: Path | None = typer.Option(
+        None, help="Query the scan held by a `mezdisk serve` socket."
+    ),
+    limit: int = typer.Option(50, help="Show at most this many matches, largest first."),
+    as_json: bool = typer.Option(False, "--json", help="Print one JSON object per match."),
+    max_depth: int | None = typer.Option(None, help="Max scan depth (None = full scan)."),
+    follow_symlinks: bool = typer.Option(False, help="Follow symlinks (can loop)."),
+) -> None:
+    """List files and directories matching a query, largest first.
+
+    Keys: size, age, ext, name, depth, under, type. Terms are ANDed unless joined with
+    `or`; `not` and parentheses work as usual. A bare glob like `*.log` matches names.
+    """
+
+    import json
+
+    from .query import QueryError, largest_matches, parse_query
+    from .snapshot import node_summary, result_from_dict
+
+    if connect is not None:
+        from .client import ScanClient, ServerError
+
+        try:
+            with ScanClient(connect) as client:
+                rows = client.request("query", expr=expr, k=limit)
+        except (OSError, ServerError) as exc:
+            raise typer.BadParameter(f"cannot use {connect}: {exc}") from exc
+    else:
+        if snapshot is not None:
+            result = result_from_dict(json.loads(snapshot.read_text()))
+        else:
+            result = scan_path(
+                path.expanduser().resolve(),
+                ScanConfig(max_depth=max_depth, follow_symlinks=follow_symlinks),
+            )
+        try:
+            parsed = parse_query(expr, root=result.root.path)
+        except QueryError as exc:
+            raise typer.BadParameter(str(exc), param_hint="EXPR") from exc
+        matches = largest_matches(result.root, parsed, now=result.scanned_at, max_items=limit)
+        rows = [node_summary(n) for n in matches]
+
+    for row in rows:
+        if as_json:
+            typer.echo(json.dumps(row))
+        else:
+            size = format_bytes(row["size_bytes"])
+            if row.get("estimated"):
+                size = f"≈{size}"
+            typer.echo(f"{size:>10}  {row['path']}{'/' if row['is_dir'] else ''}")
+
+
+@app.command()
+def serve(
+    path: Path = typer.Argument(Path("."), help="Path to keep scanned."),
+    socket: Path = typer.Option(..., help="Unix socket to answer queries on."),
+    refresh: float = typer.Option(300.0, help="Seconds between rescans (0 = only on request)."),
+    max_depth: int | None = typer.Option(None, help="Max scan depth (None = full scan)."),
+    follow_symlinks: bool = typer.Option(False, help="Follow symlinks (can loop)."),
+    max_ops: float | None = typer.Option(
+        None, min=1, help="Cap directory listings + stats per second during rescans."
+    ),
+    low_priority: bool = typer.Option(
+        False, help="Run at the lowest CPU priority and (Linux) the idle I/O class."
+    ),
+) -> None:
+    """Keep one scan resident and answer JSON queries on a local Unix socket."""
+
+    from .server import serve as serve_forever
+
+    if low_priority:
+        # Before the rescan thread starts, so that it inherits the priority.
+        _lower_priority()
+    root_path = path.expanduser().resolve()
+    typer.echo(f"Serving {root_path} on {socket}")
+    with contextlib.suppress(KeyboardInterrupt):
+        serve_forever(
+            root_path,
+            socket,
+            ScanConfig(max_depth=max_depth, follow_symlinks=follow_symlinks, max_ops_per_s=max_ops),
+            refresh_s=refresh if refresh > 0 else None,
+        )
+
+
+def _lower_priority() -> None:
+    if not lower_priority():
+        typer.echo("Warning: could not lower the process priority.", err=True)
 
 
 if __name__ == "__main__":
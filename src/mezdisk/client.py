@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+import socket
+from pathlib import Path
+from typing import Any
+
+from .models import ScanResult
+from .snapshot import result_from_dict
+
+
+class ServerError(Exception):
+    pass
+
+
+class ScanClient:
+    """Connection to a `mezdisk serve` socket; see `server.py` for the protocol."""
+
+    def __init__(self, socket_path: Path, *, timeout_s: float | None = None) -> None:
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout_s)
+        self._sock.connect(str(socket_path))
+        self._file = self._sock.makefile("rwb")
+
+    def __enter__(self) -> ScanClient:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def request(self, op: str, **args: Any) -> Any:
+        self._file.write(json.dumps({"op": op, **args}).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ServerError("server closed the connection")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise ServerError(reply.get("error", "unknown error"))
+        return reply["result"]
+
+    def fetch_result(self) -> ScanResult:
+        return result_from_dict(self.request("snapshot"))
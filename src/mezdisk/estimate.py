@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import math
+import random
+import statistics
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from .models import Node, ScanResult, ScanStats
+from .scan import ScanConfig, scan_path
+
+
+@dataclass(frozen=True, slots=True)
+class EstimateConfig:
+    # Levels below the root that are listed exactly; subdirectories of the deepest
+    # listed level are sampled.
+    exact_depth: int = 2
+    # Subdirectories scanned in full per sampled directory (at least 2). More samples
+    # means tighter intervals and a longer scan.
+    samples: int = 8
+    confidence: float = 0.95
+    seed: int | None = None
+
+
+def estimate_path(path: Path, config: ScanConfig, estimate: EstimateConfig) -> ScanResult:
+    """Estimate subtree sizes beneath `path` by sampling.
+
+    Directories down to `estimate.exact_depth` are listed exactly. Below that, for each
+    listed directory a random sample of its subdirectories is scanned in full and the
+    others are given the sample mean as an `estimated` size. Each directory's
+    `margin_bytes` is the half-width of a normal-approximation confidence interval.
+    `deadline_s` / `max_entries` bound the whole run; `max_depth` is ignored.
+    """
+
+    start = time.perf_counter()
+    shallow = scan_path(path, replace(config, max_depth=max(0, estimate.exact_depth) + 1))
+    root = shallow.root
+    now = shallow.scanned_at
+    files, dirs, errors = shallow.stats.files, shallow.stats.dirs, shallow.stats.errors
+
+    rng = random.Random(estimate.seed)
+    z = statistics.NormalDist().inv_cdf(0.5 + estimate.confidence / 2)
+    wanted = max(2, estimate.samples)
+
+    # Directories of the exact part, parents before children.
+    listed: list[Node] = []
+    stack = [root] if root.is_dir else []
+    while stack:
+        node = stack.pop()
+        listed.append(node)
+        stack.extend(c for c in node.children if c.is_dir and c.children)
+
+    for parent in listed:
+        frontier = [c for c in parent.children if c.is_dir and c.incomplete and not c.children]
+        if not frontier:
+            continue
+
+        sampled = rng.sample(frontier, min(wanted, len(frontier)))
+        sizes: list[int] = []
+        allocs: list[int] = []
+        for child in sampled:
+            budget = config
+            if config.deadline_s is not None:
+                remaining = config.deadline_s - (time.perf_counter() - start)
+                if remaining <= 0:
+                    break
+                budget = replace(budget, deadline_s=remaining)
+            if config.max_entries is not None:
+                remaining_entries = config.max_entries - (files + dirs)
+                if remaining_entries <= 0:
+                    break
+                budget = replace(budget, max_entries=remaining_entries)
+
+            sub = scan_path(child.path, replace(budget, max_depth=None))
+            files += sub.stats.files
+            dirs += sub.stats.dirs - 1
+            errors += sub.stats.errors
+            _replace_subtree(child, sub.root, now)
+            if not child.incomplete:
+                # A sample cut off by the budget is only a lower bound.
+                sizes.append(child.size_bytes)
+                allocs.append(child.alloc_bytes)
+
+        if not sizes:
+            continue
+
+        unsampled = [c for c in frontier if c.incomplete and not c.children]
+        if len(sizes) < 2 or not unsampled:
+            continue
+
+        n = len(frontier)
+        k = len(sizes)
+        mean = statistics.fmean(sizes)
+        # The frontier total, estimated from a simple random sample without replacement,
+        # has standard error s * sqrt(n * (n - k) / k). Giving each of the n - k unsampled
+        # children s * sqrt(n / k) makes `Node.rollup`'s root-sum-square come to exactly
+        # that, and is never below s * sqrt(1 + 1 / k), the error in predicting one
+        # unsampled child from the sample mean.
+        per_child_margin = round(z * statistics.stdev(sizes) * math.sqrt(n / k))
+        for child in unsampled:
+            child.size_bytes = round(mean)
+            child.alloc_bytes = round(statistics.fmean(allocs))
+            child.margin_bytes = per_child_margin
+            child.estimated = True
+            child.truncated = child.incomplete = False
+
+    for node in reversed(listed):
+        node.rollup(now)
+
+    return ScanResult(
+        root=root,
+        stats=ScanStats(files=files, dirs=dirs, errors=errors),
+        elapsed_s=time.perf_counter() - start,
+        scanned_at=now,
+    )
+
+
+def refine_estimate(result: ScanResult, node: Node, config: ScanConfig) -> ScanResult:
+    """Replace `node` (an estimated or partial subtree of `result`) with an exact scan.
+
+    The tree is updated in place and ancestors are re-totalled; the returned result
+    carries the adjusted stats.
+    """
+
+    if _ancestors(result.root, node) is None:
+        raise ValueError(f"{node.path} is not part of this scan result")
+    return apply_rescan(result, node, scan_path(node.path, replace(config, max_depth=None)))
+
+
+def apply_rescan(result: ScanResult, node: Node, sub: ScanResult) -> ScanResult:
+    """The tree-updating half of `refine_estimate`, given `sub`, a full scan of `node.path`.
+
+    Split out so the scan can run on a worker thread while the tree is only changed on
+    the thread that draws it.
+    """
+
+    chain = _ancestors(result.root, node)
+    if chain is None:
+        raise ValueError(f"{node.path} is not part of this scan result")
+
+    old_files, old_dirs, old_errors = _counts(node)
+    _replace_subtree(node, sub.root, result.scanned_at)
+    for ancestor in reversed(chain):
+        ancestor.rollup(result.scanned_at)
+
+    stats = result.stats
+    return ScanResult(
+        root=result.root,
+        stats=ScanStats(
+            files=stats.files - old_files + sub.stats.files,
+            dirs=stats.dirs - old_dirs + sub.stats.dirs,
+            errors=stats.errors - old_errors + sub.stats.errors,
+        ),
+        elapsed_s=result.elapsed_s + sub.elapsed_s,
+        scanned_at=result.scanned_at,
+    )
+
+
+def _replace_subtree(node: Node, scanned: Node, now: float) -> None:
+    node.children = scanned.children
+    node.error = scanned.error
+    node.estimated = False
+    node.margin_bytes = 0
+    if node.is_dir and scanned.is_dir:
+        node.truncated = scanned.truncated
+        node.rollup(now)
+    else:
+        node.size_bytes = scanned.size_bytes
+        node.alloc_bytes = scanned.alloc_bytes
+        node.truncated = node.incomplete = False
+
+
+def _ancestors(root: Node, target: Node) -> list[Node] | None:
+    chain: list[Node] = []
+    current = root
+    while current is not target:
+        if target.path == current.path or current.path not in target.path.parents:
+            return None
+        for child in current.children:
+            if child is target or child.path in target.path.parents:
+                chain.append(current)
+                current = child
+                break
+        else:
+            return None
+    return chain
+
+
+def _counts(node: Node) -> tuple[int, int, int]:
+    files = dirs = errors = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.is_dir:
+            dirs += 1
+        else:
+            files += 1
+        if current.error:
+            errors += 1
+        stack.extend(current.children)
+    return files, dirs, errors
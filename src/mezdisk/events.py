@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from .models import Node, ScanResult
+
+
+@dataclass(frozen=True, slots=True)
+class DirEntered:
+    path: Path
+    depth: int
+
+
+@dataclass(frozen=True, slots=True)
+class DirCompleted:
+    # `node.size_bytes` is the final subtree total.
+    node: Node
+    depth: int
+
+
+@dataclass(frozen=True, slots=True)
+class FileScanned:
+    node: Node
+    depth: int
+
+
+@dataclass(frozen=True, slots=True)
+class ScanError:
+    path: Path
+    message: str
+
+
+@dataclass(frozen=True, slots=True)
+class ScanProgress:
+    files: int
+    dirs: int
+    errors: int
+    entries: int
+    elapsed_s: float
+    current: Path
+    # Entries listed per second since the previous progress event, and the
+    # throttle's current cap (None when the scan is not throttled).
+    entries_per_s: float = 0.0
+    limit_per_s: float | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class ScanFinished:
+    result: ScanResult
+
+
+ScanEvent = DirEntered | DirCompleted | FileScanned | ScanError | ScanProgress | ScanFinished
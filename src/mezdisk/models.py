@@ -1,16 +1,52 @@
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from .age import AGE_BUCKET_COUNT, age_bucket
+
+
+# Per-directory owner totals are keyed by one int packing (uid, gid), which keeps
+# `Node.owner_bytes` a small flat dict.
+def owner_key(uid: int, gid: int) -> int:
+    return (uid << 32) | (gid & 0xFFFFFFFF)
+
+
+def split_owner_key(key: int) -> tuple[int, int]:
+    return key >> 32, key & 0xFFFFFFFF
+
 
 @dataclass(slots=True)
 class Node:
     path: Path
     is_dir: bool
     size_bytes: int = 0
+    # Space allocated on disk (`st_blocks`), for directories the total beneath them.
+    # Below `size_bytes` for sparse or compressed files, above it for small ones.
+    alloc_bytes: int = 0
     children: list["Node"] = field(default_factory=list)
     error: str | None = None
+    # True when the scan stopped before this subtree was fully listed
+    # (depth limit or scan budget); `size_bytes` is then a lower bound.
+    incomplete: bool = False
+    # The scan stopped before this directory's own entries were all listed. Unlike
+    # `incomplete` it is not derived from the children, so `rollup` keeps it.
+    truncated: bool = False
+    # Whole seconds since the epoch; for directories, the newest value beneath them.
+    mtime: int = 0
+    atime: int = 0
+    # Directories only: bytes beneath them per `age.AGE_BUCKET_DAYS` bucket (by mtime).
+    age_bytes: list[int] | None = None
+    # Files only (-1 = unknown); directories are not stat'ed by the scanner.
+    uid: int = -1
+    gid: int = -1
+    # Directories only: bytes beneath them per `owner_key(uid, gid)`.
+    owner_bytes: dict[int, int] | None = None
+    # Set by `estimate.estimate_path`: `size_bytes` is extrapolated from samples and
+    # `margin_bytes` is the half-width of its confidence interval.
+    estimated: bool = False
+    margin_bytes: int = 0
 
     @property
     def name(self) -> str:
@@ -18,6 +54,52 @@ class Node:
             return self.path.name
         return str(self.path)
 
+    def rollup(self, now: float) -> None:
+        """Recompute this directory's totals from its (already final) children.
+
+        `now` is the scan's reference time for the age buckets.
+        """
+
+        size = 0
+        alloc = 0
+        mtime = 0
+        atime = 0
+        age_bytes = [0] * AGE_BUCKET_COUNT
+        owner_bytes: dict[int, int] = {}
+        incomplete = self.truncated
+        estimated = False
+        margin_sq = 0
+        for c in self.children:
+            size += c.size_bytes
+            alloc += c.alloc_bytes
+            mtime = max(mtime, c.mtime)
+            atime = max(atime, c.atime)
+            incomplete = incomplete or c.incomplete
+            if c.estimated:
+                estimated = True
+                margin_sq += c.margin_bytes * c.margin_bytes
+            if c.is_dir:
+                if c.age_bytes is not None:
+                    for i, b in enumerate(c.age_bytes):
+                        age_bytes[i] += b
+                for key, b in (c.owner_bytes or {}).items():
+                    owner_bytes[key] = owner_bytes.get(key, 0) + b
+            elif c.size_bytes:
+                age_bytes[age_bucket(c.mtime, now)] += c.size_bytes
+                key = owner_key(c.uid, c.gid)
+                owner_bytes[key] = owner_bytes.get(key, 0) + c.size_bytes
+
+        self.size_bytes = size
+        self.alloc_bytes = alloc
+        self.mtime = mtime
+        self.atime = atime
+        self.age_bytes = age_bytes
+        self.owner_bytes = owner_bytes
+        self.incomplete = incomplete
+        self.estimated = estimated
+        # Sampling errors of different subtrees are independent.
+        self.margin_bytes = math.isqrt(margin_sq)
+
 
 @dataclass(frozen=True, slots=True)
 class ScanStats:
@@ -31,3 +113,5 @@ class ScanResult:
     root: Node
     stats: ScanStats
     elapsed_s: float
+    # Wall-clock time (epoch seconds) the scan started; the reference for file ages.
+    scanned_at: float
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from .models import Node, ScanResult
+
+MOUNT_TABLE = Path("/proc/self/mounts")
+
+# Kernel and virtual filesystems; they hold no disk space worth listing.
+PSEUDO_FS_TYPES = frozenset(
+    {
+        "autofs",
+        "binfmt_misc",
+        "bpf",
+        "cgroup",
+        "cgroup2",
+        "configfs",
+        "debugfs",
+        "devpts",
+        "devtmpfs",
+        "efivarfs",
+        "fusectl",
+        "hugetlbfs",
+        "mqueue",
+        "nsfs",
+        "proc",
+        "pstore",
+        "rpc_pipefs",
+        "securityfs",
+        "selinuxfs",
+        "sysfs",
+        "tracefs",
+    }
+)
+
+
+@dataclass(frozen=True, slots=True)
+class MountEntry:
+    device: str
+    mount_point: Path
+    fs_type: str
+
+    @property
+    def is_pseudo(self) -> bool:
+        return self.fs_type in PSEUDO_FS_TYPES
+
+
+@dataclass(frozen=True, slots=True)
+class FilesystemUsage:
+    mount: MountEntry
+    total_bytes: int
+    used_bytes: int
+    # Available to unprivileged users (excludes blocks reserved for root).
+    free_bytes: int
+
+    @property
+    def used_fraction(self) -> float:
+        usable = self.used_bytes + self.free_bytes
+        return 0.0 if usable <= 0 else self.used_bytes / usable
+
+
+@dataclass(frozen=True, slots=True)
+class Reconciliation:
+    """A scan's total set against what its filesystem reports as used.
+
+    `unaccounted_bytes` > 0 is space the scan could not see: deleted files still held
+    open, files hidden under mount points, unreadable directories, filesystem
+    metadata (directories included). `scanned_bytes` is allocated space, like the
+    filesystem's own count, but it can still come out larger: hard links are counted
+    once per name.
+    """
+
+    usage: FilesystemUsage
+    scanned_bytes: int
+    # The scan was partial or estimated, so the difference also covers what it skipped.
+    partial: bool = False
+
+    @property
+    def unaccounted_bytes(self) -> int:
+        return self.usage.used_bytes - self.scanned_bytes
+
+
+def _unescape(field: str) -> str:
+    # The kernel writes space, tab, newline and backslash as octal escapes.
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def read_mount_table(source: Path = MOUNT_TABLE) -> list[MountEntry]:
+    """Mounted filesystems in mount order, pseudo filesystems included.
+
+    Without a Linux mount table, only "/" is returned.
+    """
+
+    try:
+        lines = source.read_text().splitlines()
+    except OSError:
+        return [MountEntry(device="", mount_point=Path("/"), fs_type="")]
+
+    entries = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        entries.append(
+            MountEntry(
+                device=_unescape(fields[0]),
+                mount_point=Path(_unescape(fields[1])),
+                fs_type=fields[2],
+            )
+        )
+    return entries
+
+
+def filesystem_usage(mount: MountEntry) -> FilesystemUsage | None:
+    try:
+        st = os.statvfs(mount.mount_point)
+    except OSError:
+        return None
+    return FilesystemUsage(
+        mount=mount,
+        total_bytes=st.f_blocks * st.f_frsize,
+        used_bytes=(st.f_blocks - st.f_bfree) * st.f_frsize,
+        free_bytes=st.f_bavail * st.f_frsize,
+    )
+
+
+def list_filesystems(*, include_pseudo: bool = False) -> list[FilesystemUsage]:
+    """Usage of each mounted filesystem, fullest first.
+
+    Only `statvfs` per mount point, so this is instant. A mount point mounted over
+    (or bind-mounted) more than once is listed once, for the topmost mount.
+    """
+
+    topmost: dict[Path, MountEntry] = {}
+    for entry in read_mount_table():
+        if include_pseudo or not entry.is_pseudo:
+            topmost[entry.mount_point] = entry
+
+    out = []
+    for entry in topmost.values():
+        usage = filesystem_usage(entry)
+        if usage is not None and (include_pseudo or usage.total_bytes > 0):
+            out.append(usage)
+    out.sort(key=lambda u: u.used_fraction, reverse=True)
+    return out
+
+
+def mount_for(path: Path, table: list[MountEntry]) -> MountEntry | None:
+    """The mount `path` lives on: the longest matching mount point, later mounts winning."""
+
+    best = None
+    for entry in table:
+        mp = entry.mount_point
+        if (mp == path or mp in path.parents) and (
+            best is None or len(mp.parts) >= len(best.mount_point.parts)
+        ):
+            best = entry
+    return best
+
+
+def reconcile(result: ScanResult, table: list[MountEntry] | None = None) -> Reconciliation | None:
+    """Compare `result` with its filesystem's used space.
+
+    Only possible when the scan root is a mount point, since a subdirectory cannot
+    explain the whole filesystem. Subtrees that are other filesystems mounted beneath
+    the root are left out of the scanned total.
+    """
+
+    table = read_mount_table() if table is None else table
+    root = result.root
+    mount = mount_for(root.path, table)
+    if mount is None or mount.mount_point != root.path:
+        return None
+    usage = filesystem_usage(mount)
+    if usage is None:
+        return None
+
+    nested = sorted(
+        {e.mount_point for e in table if root.path in e.mount_point.parents},
+        key=lambda p: len(p.parts),
+    )
+    scanned = root.alloc_bytes
+    counted: list[Path] = []
+    for mount_point in nested:
+        # Only the outermost nested mounts; what is beneath them was already left out.
+        if any(outer in mount_point.parents for outer in counted):
+            continue
+        node = _find(root, mount_point)
+        if node is not None:
+            scanned -= node.alloc_bytes
+            counted.append(mount_point)
+    return Reconciliation(
+        usage=usage, scanned_bytes=scanned, partial=root.incomplete or root.estimated
+    )
+
+
+def _find(root: Node, path: Path) -> Node | None:
+    current = root
+    for part in path.relative_to(root.path).parts:
+        for child in current.children:
+            if child.path.name == part:
+                current = child
+                break
+        else:
+            return None
+    return current
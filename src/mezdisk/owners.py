@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .models import Node, split_owner_key
+
+try:
+    import grp
+    import pwd
+except ImportError:  # Windows: no user/group database, ids are shown as numbers.
+    grp = None
+    pwd = None
+
+
+@lru_cache(maxsize=4096)
+def user_name(uid: int) -> str:
+    if pwd is not None:
+        try:
+            return pwd.getpwuid(uid).pw_name
+        except KeyError:
+            pass
+    return str(uid)
+
+
+@lru_cache(maxsize=4096)
+def group_name(gid: int) -> str:
+    if grp is not None:
+        try:
+            return grp.getgrgid(gid).gr_name
+        except KeyError:
+            pass
+    return str(gid)
+
+
+def resolve_uid(value: str) -> int:
+    """Parse a user name or numeric uid. Raises ValueError for unknown names."""
+
+    if value.isdigit():
+        return int(value)
+    if pwd is not None:
+        try:
+            return pwd.getpwnam(value).pw_uid
+        except KeyError:
+            pass
+    raise ValueError(f"unknown user: {value}")
+
+
+def resolve_gid(value: str) -> int:
+    """Parse a group name or numeric gid. Raises ValueError for unknown names."""
+
+    if value.isdigit():
+        return int(value)
+    if grp is not None:
+        try:
+            return grp.getgrnam(value).gr_gid
+        except KeyError:
+            pass
+    raise ValueError(f"unknown group: {value}")
+
+
+def usage_by_owner(node: Node, *, by_group: bool = False) -> list[tuple[int, int]]:
+    """Return (uid or gid, bytes) pairs beneath `node`, largest first."""
+
+    totals: dict[int, int] = {}
+    if node.is_dir:
+        for key, size in (node.owner_bytes or {}).items():
+            owner = split_owner_key(key)[1 if by_group else 0]
+            totals[owner] = totals.get(owner, 0) + size
+    elif node.size_bytes > 0:
+        totals[node.gid if by_group else node.uid] = node.size_bytes
+    return sorted(totals.items(), key=lambda t: t[1], reverse=True)
+
+
+@dataclass(frozen=True, slots=True)
+class OwnerFilter:
+    uid: int | None = None
+    gid: int | None = None
+
+    def matches(self, uid: int, gid: int) -> bool:
+        if self.uid is not None and uid != self.uid:
+            return False
+        return self.gid is None or gid == self.gid
+
+    def weight(self, node: Node) -> int:
+        """Bytes beneath `node` owned by the filtered user/group."""
+
+        if not node.is_dir:
+            return max(0, node.size_bytes) if self.matches(node.uid, node.gid) else 0
+        total = 0
+        for key, size in (node.owner_bytes or {}).items():
+            if self.matches(*split_owner_key(key)):
+                total += size
+        return total
+
+    def describe(self) -> str:
+        parts = []
+        if self.uid is not None:
+            parts.append(f"user {user_name(self.uid)}")
+        if self.gid is not None:
+            parts.append(f"group {group_name(self.gid)}")
+        return ", ".join(parts) or "all owners"
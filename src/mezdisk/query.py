@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import heapq
+import re
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+from .age import age_days, first_bucket_at_least
+from .models import Node
+
+# Query language, e.g. `ext:log size>1G age>30d under:/srv`:
+#
+#   size>1G  size<=500M      sizes in B/K/M/G/T (decimal) or KiB/MiB/GiB/TiB
+#   age>30d                  days since last modification (h/d/w/y units)
+#   ext:log  ext:.tar.gz     file extension, case-insensitive (files only)
+#   name:*.tmp  *.tmp        glob on the entry name (a bare word with * ? [ is a glob)
+#   depth<=3                 depth below where the query starts (that node = 0)
+#   under:/srv/data          path prefix (absolute, or relative to the scan root)
+#   type:file  type:dir
+#
+# Terms are combined with `and` (implicit between terms), `or`, `not` and
+# parentheses. Comparisons are `>`, `>=`, `<`, `<=`, `=`, `!=`; `:` means `=`.
+
+
+class QueryError(ValueError):
+    pass
+
+
+_SIZE_UNITS = {
+    "": 1,
+    "b": 1,
+    "k": 10**3,
+    "kb": 10**3,
+    "m": 10**6,
+    "mb": 10**6,
+    "g": 10**9,
+    "gb": 10**9,
+    "t": 10**12,
+    "tb": 10**12,
+    "kib": 2**10,
+    "mib": 2**20,
+    "gib": 2**30,
+    "tib": 2**40,
+}
+_AGE_UNITS = {"": 1.0, "d": 1.0, "h": 1 / 24, "w": 7.0, "y": 365.0}
+
+_OPS: dict[str, Callable[[float, float], bool]] = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+}
+
+_TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<paren>[()])
+      | (?P<key>[a-z]+)(?P<op>>=|<=|!=|>|<|=|:)(?:"(?P<quoted>[^"]*)"|(?P<value>[^\s()]+))
+      | (?P<word>[^\s()]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+def parse_size(text: str) -> int:
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]*)", text.strip().lower())
+    if m is None or m.group(2) not in _SIZE_UNITS:
+        raise QueryError(f"bad size: {text!r}")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2)])
+
+
+def parse_age_days(text: str) -> float:
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([a-z]*)", text.strip().lower())
+    if m is None or m.group(2) not in _AGE_UNITS:
+        raise QueryError(f"bad age: {text!r}")
+    return float(m.group(1)) * _AGE_UNITS[m.group(2)]
+
+
+@dataclass(frozen=True, slots=True)
+class Bounds:
+    """What every match of a query must satisfy, used to skip whole subtrees.
+
+    A directory's size and newest mtime bound everything beneath it, so if a
+    directory is below `min_size` (or, when matches cannot be empty files, has no
+    bytes at least `min_age_days` old) its subtree cannot contain a match.
+    """
+
+    min_size: int = 0
+    min_age_days: float = 0.0
+    max_depth: int | None = None
+    under: Path | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Query:
+    text: str
+    # (node, depth, now) -> bool
+    matches: Callable[[Node, int, float], bool]
+    bounds: Bounds
+
+    def can_contain_match(self, node: Node, depth: int, now: float) -> bool:
+        b = self.bounds
+        if b.max_depth is not None and depth > b.max_depth:
+            return False
+        if node.size_bytes < b.min_size:
+            return False
+        # A directory's mtime is the newest beneath it; its age histogram says whether
+        # anything beneath is old enough, but it counts bytes and so misses empty files.
+        if b.min_age_days > 0 and age_days(node.mtime, now) < b.min_age_days:
+            if not node.is_dir:
+                return False
+            if (
+                b.min_size > 0
+                and node.age_bytes is not None
+                and not any(node.age_bytes[first_bucket_at_least(b.min_age_days) :])
+            ):
+                return False
+        if b.under is not None:
+            return (
+                node.path == b.under
+                or b.under in node.path.parents
+                or (node.path in b.under.parents)
+            )
+        return True
+
+
+def parse_query(text: str, *, root: Path | None = None) -> Query:
+    """Parse a query expression. Relative `under:` paths resolve against `root`."""
+
+    tokens: list[tuple[str, ...]] = []
+    pos = 0
+    text_stripped = text.strip()
+    while pos < len(text_stripped):
+        m = _TOKEN.match(text_stripped, pos)
+        if m is None or m.end() == pos:
+            raise QueryError(f"cannot parse query at: {text_stripped[pos:]!r}")
+        pos = m.end()
+        if m.group("paren"):
+            tokens.append((m.group("paren"),))
+        elif m.group("key"):
+            value = m.group("quoted") if m.group("quoted") is not None else m.group("value")
+            tokens.append(("term", m.group("key"), m.group("op"), value))
+        elif m.group("word").lower() in ("and", "or", "not"):
+            tokens.append((m.group("word").lower(),))
+        elif any(ch in m.group("word") for ch in "*?["):
+            tokens.append(("term", "name", ":", m.group("word")))
+        else:
+            raise QueryError(f"unknown word in query: {m.group('word')!r}")
+
+    if not tokens:
+        raise QueryError("empty query")
+
+    parser = _Parser(tokens, root)
+    matches, bounds = parser.parse_or()
+    if parser.pos != len(tokens):
+        raise QueryError(f"unexpected {tokens[parser.pos][0]!r} in query")
+    return Query(text=text, matches=matches, bounds=bounds)
+
+
+_Pred = Callable[[Node, int, float], bool]
+
+
+class _Parser:
+    def __init__(self, tokens: list[tuple[str, ...]], root: Path | None) -> None:
+        self.tokens = tokens
+        self.pos = 0
+        self.root = root
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def parse_or(self) -> tuple[_Pred, Bounds]:
+        parts = [self.parse_and()]
+        while self._peek() == "or":
+            self.pos += 1
+            parts.append(self.parse_and())
+        if len(parts) == 1:
+            return parts[0]
+        preds = [p for p, _ in parts]
+        bounds = [b for _, b in parts]
+        depths = [b.max_depth for b in bounds]
+        unders = {b.under for b in bounds}
+        return (
+            lambda n, d, now: any(p(n, d, now) for p in preds),
+            Bounds(
+                min_size=min(b.min_size for b in bounds),
+                min_age_days=min(b.min_age_days for b in bounds),
+                max_depth=None if None in depths else max(d for d in depths if d is not None),
+                under=unders.pop() if len(unders) == 1 else None,
+            ),
+        )
+
+    def parse_and(self) -> tuple[_Pred, Bounds]:
+        parts = [self.parse_unary()]
+        while self._peek() not in (None, "or", ")"):
+            if self._peek() == "and":
+                self.pos += 1
+            parts.append(self.parse_unary())
+        if len(parts) == 1:
+            return parts[0]
+        preds = [p for p, _ in parts]
+        bounds = [b for _, b in parts]
+        depths = [b.max_depth for b in bounds if b.max_depth is not None]
+        unders = [b.under for b in bounds if b.under is not None]
+        return (
+            lambda n, d, now: all(p(n, d, now) for p in preds),
+            Bounds(
+                min_size=max(b.min_size for b in bounds),
+                min_age_days=max(b.min_age_days for b in bounds),
+                max_depth=min(depths) if depths else None,
+                # The deepest prefix is the tightest; disjoint prefixes simply never match.
+                under=max(unders, key=lambda p: len(p.parts)) if unders else None,
+            ),
+        )
+
+    def parse_unary(self) -> tuple[_Pred, Bounds]:
+        tok = self._peek()
+        if tok is None:
+            raise QueryError("query ends unexpectedly")
+        if tok == "not":
+            self.pos += 1
+            pred, _ = self.parse_unary()
+            return (lambda n, d, now: not pred(n, d, now)), Bounds()
+        if tok == "(":
+            self.pos += 1
+            inner = self.parse_or()
+            if self._peek() != ")":
+                raise QueryError("missing ')' in query")
+            self.pos += 1
+            return inner
+        if tok == "term":
+            _, key, op, value = self.tokens[self.pos]
+            self.pos += 1
+            return self._term(key, "=" if op == ":" else op, value)
+        raise QueryError(f"unexpected {tok!r} in query")
+
+    def _term(self, key: str, op: str, value: str) -> tuple[_Pred, Bounds]:
+        if key == "size":
+            limit = parse_size(value)
+            cmp = _OPS[op]
+            bounds = Bounds(min_size=_lower_bound(op, limit))
+            return (lambda n, d, now: cmp(n.size_bytes, limit)), bounds
+
+        if key == "age":
+            days = parse_age_days(value)
+            cmp = _OPS[op]
+            # Ages are fractional days; pruning compares against `days` itself.
+            bounds = Bounds(min_age_days=days if op in (">", ">=", "=") else 0.0)
+            return (lambda n, d, now: cmp(age_days(n.mtime, now), days)), bounds
+
+        if key == "depth":
+            try:
+                limit = int(value)
+            except ValueError:
+                raise QueryError(f"bad depth: {value!r}") from None
+            cmp = _OPS[op]
+            upper = {"<": limit - 1, "<=": limit, "=": limit}.get(op)
+            return (lambda n, d, now: cmp(d, limit)), Bounds(max_depth=upper)
+
+        if op not in ("=", "!="):
+            raise QueryError(f"{key} only supports ':', '=' and '!='")
+        negate = op == "!="
+
+        if key == "ext":
+            suffix = value.lower().lstrip(".")
+            suffix = f".{suffix}"
+            return _maybe_not(
+                lambda n, d, now: not n.is_dir and n.name.lower().endswith(suffix), negate
+            )
+
+        if key == "name":
+            pattern = value
+
+            def name_matches(n: Node, d: int, now: float) -> bool:
+                return fnmatchcase(n.name, pattern)
+
+            return _maybe_not(name_matches, negate)
+
+        if key == "type":
+            if value not in ("file", "dir"):
+                raise QueryError("type must be 'file' or 'dir'")
+            want_dir = value == "dir"
+            return _maybe_not(lambda n, d, now: n.is_dir == want_dir, negate)
+
+        if key in ("under", "path"):
+            prefix = Path(value)
+            if not prefix.is_absolute():
+                if self.root is None:
+                    raise QueryError(f"{key}: needs an absolute path")
+                prefix = self.root / prefix
+
+            def is_under(n: Node, d: int, now: float) -> bool:
+                return n.path == prefix or prefix in n.path.parents
+
+            pred, bounds = _maybe_not(is_under, negate)
+            return pred, bounds if negate else Bounds(under=prefix)
+
+        raise QueryError(f"unknown query key: {key!r}")
+
+
+def _lower_bound(op: str, limit: int) -> int:
+    if op == ">":
+        return int(limit) + 1
+    if op in (">=", "="):
+        return int(limit)
+    return 0
+
+
+def _maybe_not(pred: _Pred, negate: bool) -> tuple[_Pred, Bounds]:
+    if negate:
+        return (lambda n, d, now: not pred(n, d, now)), Bounds()
+    return pred, Bounds()
+
+
+def iter_matches(root: Node, query: Query, *, now: float) -> Iterator[tuple[Node, int]]:
+    """Yield (node, depth) for every node beneath `root` (inclusive) matching `query`.
+
+    Subtrees that `query.bounds` rules out are skipped without being visited.
+    """
+
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if not query.can_contain_match(node, depth, now):
+            continue
+        if query.matches(node, depth, now):
+            yield node, depth
+        if node.is_dir:
+            stack.extend((c, depth + 1) for c in reversed(node.children))
+
+
+def largest_matches(root: Node, query: Query, *, now: float, max_items: int) -> list[Node]:
+    return heapq.nlargest(
+        max_items, (n for n, _ in iter_matches(root, query, now=now)), key=lambda n: n.size_bytes
+    )
+
+
+def filter_tree(root: Node, query: Query, *, now: float) -> Node | None:
+    """Copy of the tree holding only the files matching `query` and their directories.
+
+    Directory totals in the copy are re-rolled up from the kept files. Unchanged file
+    nodes are shared with the original tree. Returns None when nothing matches.
+    """
+
+    def walk(node: Node, depth: int) -> Node | None:
+        if not query.can_contain_match(node, depth, now):
+            return None
+        if not node.is_dir:
+            return node if query.matches(node, depth, now) else None
+        kept = [k for c in node.children if (k := walk(c, depth + 1)) is not None]
+        if not kept:
+            return None
+        copy = Node(path=node.path, is_dir=True, children=kept, truncated=node.truncated)
+        copy.rollup(now)
+        return copy
+
+    return walk(root, 0)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import heapq
 from dataclasses import dataclass
+from itertools import count
 from pathlib import Path
 
 from rich.align import Align
@@ -11,51 +13,102 @@ from rich.table import Table
 from rich.text import Text
 from rich.tree import Tree
 
+from .age import AGE_BUCKET_COLORS, AGE_BUCKET_LABELS, age_bucket, age_days
 from .filetypes import file_style
 from .models import Node, ScanResult
+from .mounts import FilesystemUsage, Reconciliation
+from .owners import OwnerFilter, group_name, usage_by_owner, user_name
 from .treemap import Treemap, TreemapItem
-from .util import Palette, format_bytes, largest_leaf_files
+from .util import (
+    Palette,
+    estimated_bytes,
+    format_bytes,
+    format_size,
+    largest_children,
+    largest_leaf_files,
+    largest_nodes,
+    stale_files,
+)
 
 
 @dataclass(frozen=True, slots=True)
 class RenderConfig:
     tree_depth: int = 4
     max_children: int = 30
+    tree_rows: int = 200
     treemap_height: int = 18
     treemap_items: int = 25
-
-
-def build_report(result: ScanResult, root_path: Path, config: RenderConfig) -> Layout:
+    color_by_age: bool = False
+    cold_days: int = 180
+    owner: OwnerFilter | None = None
+
+
+def build_report(
+    result: ScanResult,
+    root_path: Path,
+    config: RenderConfig,
+    *,
+    reconciliation: Reconciliation | None = None,
+) -> Layout:
     palette = Palette()
 
-    header = Panel(
-        Group(
-            Text("MezDisk", style="bold"),
-            Text(
-                f"Path: {root_path}   Total: {format_bytes(result.root.size_bytes)}   "
-                f"Dirs: {result.stats.dirs}   Files: {result.stats.files}   "
-                f"Errors: {result.stats.errors}   Time: {result.elapsed_s:.2f}s",
-                style=palette.label_dim,
-            ),
-        ),
-        border_style="bright_blue",
+    summary = Text(
+        f"Path: {root_path}   Total: {format_size(result.root)}   "
+        f"Dirs: {result.stats.dirs}   Files: {result.stats.files}   "
+        f"Errors: {result.stats.errors}   Time: {result.elapsed_s:.2f}s",
+        style=palette.label_dim,
+    )
+    if result.root.incomplete:
+        summary.append("   Partial scan (sizes are lower bounds)", style=palette.partial_color)
+    if config.owner is not None:
+        owned = config.owner.weight(result.root)
+        summary.append(f"   Showing {config.owner.describe()}: {format_bytes(owned)}", style="bold")
+
+    header_lines = [Text("MezDisk", style="bold"), summary]
+    if reconciliation is not None:
+        header_lines.append(build_reconciliation_line(reconciliation))
+    header = Panel(Group(*header_lines), border_style="bright_blue")
+
+    tree = build_tree(
+        result.root,
+        total=result.root.size_bytes,
+        max_depth=config.tree_depth,
+        max_children=config.max_children,
+        max_rows=config.tree_rows,
     )
-
-    tree = build_tree(result.root, total=result.root.size_bytes, max_depth=config.tree_depth)
     tree_panel = Panel(tree, title="Tree", border_style="bright_blue")
 
-    treemap_items = build_treemap_items(result.root, max_items=config.treemap_items)
+    treemap_items = build_treemap_items(
+        result.root,
+        max_items=config.treemap_items,
+        age_reference=result.scanned_at if config.color_by_age else None,
+        owner=config.owner,
+        unaccounted_bytes=0 if reconciliation is None else reconciliation.unaccounted_bytes,
+    )
     treemap = Treemap(treemap_items, height=config.treemap_height)
-    treemap_panel = Panel(treemap, title="Treemap", border_style="bright_blue")
+    treemap_panel = Panel(
+        treemap,
+        title="Treemap (by age)" if config.color_by_age else "Treemap",
+        subtitle=build_age_legend() if config.color_by_age else None,
+        border_style="bright_blue",
+    )
 
-    top_table = build_top_table(result.root, total=result.root.size_bytes, max_rows=12)
-    footer = Panel(Align.left(top_table), title="Largest", border_style="bright_blue")
+    total = result.root.size_bytes if config.owner is None else config.owner.weight(result.root)
+    top_table = build_top_table(result.root, total=total, max_rows=12, owner=config.owner)
+    cold_table = build_stale_table(
+        result.root,
+        now=result.scanned_at,
+        min_age_days=config.cold_days,
+        max_rows=12,
+        owner=config.owner,
+    )
+    owner_table = build_owner_table(result.root, max_rows=10)
 
     layout = Layout(name="root")
     layout.split_column(
-        Layout(header, name="header", size=4),
+        Layout(header, name="header", size=2 + len(header_lines)),
         Layout(name="body", ratio=1),
-        Layout(footer, name="footer", size=14),
+        Layout(name="footer", size=14),
     )
 
     layout["body"].split_row(
@@ -63,14 +116,43 @@ def build_report(result: ScanResult, root_path: Path, config: RenderConfig) -> L
         Layout(treemap_panel, name="right", ratio=2),
     )
 
+    layout["footer"].split_row(
+        Layout(
+            Panel(Align.left(top_table), title="Largest", border_style="bright_blue"),
+            name="largest",
+            ratio=2,
+        ),
+        Layout(
+            Panel(
+                Align.left(cold_table),
+                title=f"Largest not modified in {config.cold_days}d",
+                border_style="bright_blue",
+            ),
+            name="cold",
+            ratio=2,
+        ),
+        Layout(
+            Panel(Align.left(owner_table), title="By user", border_style="bright_blue"),
+            name="owners",
+            ratio=1,
+        ),
+    )
+
     return layout
 
 
-def build_tree(node: Node, *, total: int, max_depth: int) -> Tree:
+def build_tree(
+    node: Node,
+    *,
+    total: int,
+    max_depth: int,
+    max_children: int = 30,
+    max_rows: int | None = None,
+) -> Tree:
     palette = Palette()
 
     def label(n: Node) -> Text:
-        size = format_bytes(n.size_bytes)
+        size = format_size(n)
         percent = ""
         if total > 0:
             percent = f"  ({(n.size_bytes / total) * 100:4.1f}%)"
@@ -82,30 +164,69 @@ def build_tree(node: Node, *, total: int, max_depth: int) -> Tree:
 
         base = Text(f"{n.name} ", style=style)
         base.append(f"{size}{percent}", style="dim")
+        if n.incomplete:
+            base.append("  (partial)", style=palette.partial_color)
         if n.error:
             base.append(f"  ! {n.error}", style=palette.error_color)
         return base
 
     root = Tree(label(node), guide_style="dim")
 
-    def add_children(parent: Tree, n: Node, depth: int) -> None:
-        if depth >= max_depth:
-            return
-        if not n.children:
-            return
-
-        children = sorted(n.children, key=lambda c: c.size_bytes, reverse=True)
+    # Expand the largest directories first so the row budget goes to what matters;
+    # within a parent, children stay in size order.
+    rows = 1
+    tie = count()
+    pending: list[tuple[int, int, Node, Tree, int]] = [(-node.size_bytes, next(tie), node, root, 0)]
+    while pending:
+        _, _, n, parent, depth = heapq.heappop(pending)
+        if depth >= max_depth or not n.children:
+            continue
+        if max_rows is not None and rows >= max_rows:
+            break
+
+        limit = max_children
+        if max_rows is not None:
+            limit = min(limit, max_rows - rows)
+        children, rest_count, rest_size = largest_children(n, max_items=limit)
         for child in children:
             branch = parent.add(label(child))
             if child.is_dir:
-                add_children(branch, child, depth + 1)
+                heapq.heappush(pending, (-child.size_bytes, next(tie), child, branch, depth + 1))
+        rows += len(children)
+
+        if rest_count:
+            parent.add(
+                Text(f"… {rest_count} more  {format_bytes(rest_size)}", style=palette.label_dim)
+            )
+            rows += 1
 
-    add_children(root, node, 0)
     return root
 
 
-def build_treemap_items(node: Node, *, max_items: int) -> list[TreemapItem]:
-    selected_files, other_size = largest_leaf_files(node, max_items=max_items)
+def build_treemap_items(
+    node: Node,
+    *,
+    max_items: int,
+    age_reference: float | None = None,
+    owner: OwnerFilter | None = None,
+    unaccounted_bytes: int = 0,
+) -> list[TreemapItem]:
+    """Treemap blocks for the largest files beneath `node`.
+
+    Blocks are coloured by file type, or by mtime age bucket relative to
+    `age_reference` (usually `ScanResult.scanned_at`) when it is given. With
+    `owner`, only that owner's files (and bytes, for "Other") are shown. Sampled
+    (estimated) bytes get their own block instead of being folded into "Other".
+    `unaccounted_bytes` (filesystem usage the scan could not find, see
+    `mounts.reconcile`) is shown as one more block when positive and no owner is set.
+    Since it is allocated space, every block is then sized by `Node.alloc_bytes`.
+    """
+
+    weight = owner.weight if owner is not None else None
+    on_disk = unaccounted_bytes > 0 and owner is None
+    if on_disk:
+        weight = _allocated
+    selected_files, other_size = largest_leaf_files(node, max_items=max_items, weight=weight)
     if not selected_files and other_size <= 0:
         return []
 
@@ -117,32 +238,103 @@ def build_treemap_items(node: Node, *, max_items: int) -> list[TreemapItem]:
                 return str(f.path)
         return f.name
 
+    def color_for(f: Node) -> str:
+        if age_reference is not None:
+            return AGE_BUCKET_COLORS[age_bucket(f.mtime, age_reference)]
+        return file_style(f.path).color
+
     items: list[TreemapItem] = []
     for f in selected_files:
+        size = f.size_bytes if weight is None else weight(f)
+        items.append(TreemapItem(label=label_for(f), value=float(size), color=color_for(f)))
+
+    estimated = estimated_bytes(node, weight=weight) if owner is None else 0
+    if estimated > 0:
+        other_size = max(0, other_size - estimated)
+
+    if other_size > 0:
+        items.append(TreemapItem(label="Other", value=float(other_size), color="grey37"))
+    if estimated > 0:
+        items.append(TreemapItem(label="≈ Estimated", value=float(estimated), color="grey23"))
+    if on_disk:
         items.append(
             TreemapItem(
-                label=label_for(f), value=float(f.size_bytes), color=file_style(f.path).color
+                label="? Unaccounted",
+                value=float(unaccounted_bytes),
+                color=Palette().unaccounted_color,
             )
         )
 
-    if other_size > 0:
-        items.append(TreemapItem(label="Other", value=float(other_size), color="grey37"))
-
     return items
 
 
-def build_top_table(node: Node, *, total: int, max_rows: int) -> Table:
-    rows = []
+def _allocated(node: Node) -> int:
+    return node.alloc_bytes
+
+
+def build_reconciliation_line(reconciliation: Reconciliation) -> Text:
+    palette = Palette()
+    usage = reconciliation.usage
+    missing = reconciliation.unaccounted_bytes
+    line = Text(
+        f"Filesystem {usage.mount.mount_point} ({usage.mount.fs_type or 'unknown'}): "
+        f"{format_bytes(usage.used_bytes)} used, scan found "
+        f"{format_bytes(reconciliation.scanned_bytes)}   ",
+        style=palette.label_dim,
+    )
+    if missing > 0:
+        causes = (
+            "includes what the partial scan skipped"
+            if reconciliation.partial
+            else "open deleted files, hidden under mounts, unreadable, metadata"
+        )
+        line.append(
+            f"{format_bytes(missing)} unaccounted ({causes})", style=palette.unaccounted_color
+        )
+    else:
+        line.append(
+            f"scan counts {format_bytes(-missing)} more (hard links counted per name)",
+            style=palette.label_dim,
+        )
+    return line
+
+
+def build_filesystems_table(usages: list[FilesystemUsage]) -> Table:
+    table = Table(show_header=True, header_style="bold")
+    table.add_column("Mounted on", overflow="fold")
+    table.add_column("Type")
+    table.add_column("Device", overflow="fold", style="dim")
+    table.add_column("Size", justify="right")
+    table.add_column("Used", justify="right")
+    table.add_column("Free", justify="right")
+    table.add_column("Use%", justify="right")
+
+    for usage in usages:
+        pct = usage.used_fraction * 100
+        style = "bright_red" if pct >= 90 else "yellow" if pct >= 75 else ""
+        table.add_row(
+            str(usage.mount.mount_point),
+            usage.mount.fs_type,
+            usage.mount.device,
+            format_bytes(usage.total_bytes),
+            format_bytes(usage.used_bytes),
+            format_bytes(usage.free_bytes),
+            Text(f"{pct:.0f}%", style=style),
+        )
+
+    return table
 
-    def collect(n: Node) -> None:
-        for child in n.children:
-            rows.append(child)
-            if child.is_dir:
-                collect(child)
 
-    collect(node)
-    rows.sort(key=lambda c: c.size_bytes, reverse=True)
-    rows = rows[:max_rows]
+def build_top_table(
+    node: Node, *, total: int, max_rows: int, owner: OwnerFilter | None = None
+) -> Table:
+    """Largest files and directories beneath `node`.
+
+    With `owner`, sizes are that owner's bytes and `total` should be too.
+    """
+
+    weight = owner.weight if owner is not None else None
+    rows = largest_nodes(node, max_items=max_rows, weight=weight)
 
     table = Table(show_header=True, header_style="bold", box=None)
     table.add_column("Path", overflow="fold")
@@ -150,8 +342,62 @@ def build_top_table(node: Node, *, total: int, max_rows: int) -> Table:
     table.add_column("%", justify="right")
 
     for item in rows:
-        pct = 0.0 if total <= 0 else (item.size_bytes / total) * 100
+        size = item.size_bytes if weight is None else weight(item)
+        pct = 0.0 if total <= 0 else (size / total) * 100
         name = str(item.path)
-        table.add_row(name, format_bytes(item.size_bytes), f"{pct:4.1f}")
+        shown = format_size(item) if weight is None else format_bytes(size)
+        table.add_row(name, shown, f"{pct:4.1f}")
 
     return table
+
+
+def build_stale_table(
+    node: Node,
+    *,
+    now: float,
+    min_age_days: float,
+    max_rows: int,
+    owner: OwnerFilter | None = None,
+) -> Table:
+    weight = owner.weight if owner is not None else None
+    rows = stale_files(node, min_age_days=min_age_days, now=now, max_items=max_rows, weight=weight)
+
+    table = Table(show_header=True, header_style="bold", box=None)
+    table.add_column("Path", overflow="fold")
+    table.add_column("Size", justify="right")
+    table.add_column("Age", justify="right")
+
+    for item in rows:
+        table.add_row(
+            str(item.path), format_bytes(item.size_bytes), f"{age_days(item.mtime, now):.0f}d"
+        )
+
+    return table
+
+
+def build_owner_table(node: Node, *, max_rows: int, by_group: bool = False) -> Table:
+    usage = usage_by_owner(node, by_group=by_group)
+    total = sum(size for _, size in usage)
+
+    table = Table(show_header=True, header_style="bold", box=None)
+    table.add_column("Group" if by_group else "User")
+    table.add_column("Size", justify="right")
+    table.add_column("%", justify="right")
+
+    name = group_name if by_group else user_name
+    for owner_id, size in usage[:max_rows]:
+        pct = 0.0 if total <= 0 else (size / total) * 100
+        table.add_row(name(owner_id), format_bytes(size), f"{pct:4.1f}")
+    if len(usage) > max_rows:
+        rest = sum(size for _, size in usage[max_rows:])
+        table.add_row(f"… {len(usage) - max_rows} more", format_bytes(rest), "", style="dim")
+
+    return table
+
+
+def build_age_legend() -> Text:
+    legend = Text()
+    for label, color in zip(AGE_BUCKET_LABELS, AGE_BUCKET_COLORS, strict=True):
+        legend.append("  ", style=f"on {color}")
+        legend.append(f" {label}  ")
+    return legend
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import heapq
 import os
 import time
-from dataclasses import dataclass
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, replace
+from itertools import count, islice
 from pathlib import Path
 from typing import Callable
 
-from .models import Node, ScanResult, ScanStats
+from .age import AGE_BUCKET_COUNT, age_bucket
+from .events import (
+    DirCompleted,
+    DirEntered,
+    FileScanned,
+    ScanError,
+    ScanEvent,
+    ScanFinished,
+    ScanProgress,
+)
+from .models import Node, ScanResult, ScanStats, owner_key
+from .throttle import Throttle
 
 
 @dataclass(frozen=True, slots=True)
@@ -14,85 +29,362 @@ class ScanConfig:
     max_depth: int | None = None
     follow_symlinks: bool = False
     on_visit: Callable[[Path], None] | None = None
+    # Scan budget: once either limit is hit the scan returns what it has so far and
+    # flags unfinished directories with `Node.incomplete`.
+    deadline_s: float | None = None
+    max_entries: int | None = None
+    # Cap on directory opens + stat calls per second (see throttle.py); the scan slows
+    # further on its own while syscall latency is raised.
+    max_ops_per_s: float | None = None
 
 
-def scan_path(path: Path, config: ScanConfig) -> ScanResult:
+PROGRESS_INTERVAL_S = 0.1
+
+
+def _describe(exc: OSError) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _allocated(stat: os.stat_result) -> int:
+    # `st_blocks` counts 512-byte units wherever it exists; Windows has none.
+    blocks = getattr(stat, "st_blocks", None)
+    return stat.st_size if blocks is None else blocks * 512
+
+
+def iter_scan(path: Path, config: ScanConfig, *, file_events: bool = True) -> Iterator[ScanEvent]:
+    """Walk `path`, yielding `ScanEvent`s as the scan progresses.
+
+    The walk only advances when the consumer pulls the next event, so a slow consumer
+    throttles the scan. The last event is always `ScanFinished`. Pass
+    `file_events=False` to skip the per-file `FileScanned` events.
+    """
+
     start = time.perf_counter()
+    now = time.time()
     files = 0
     dirs = 0
     errors = 0
+    entries = 0
+    next_progress = start + PROGRESS_INTERVAL_S
+    last_progress = (start, 0)
+
+    throttle = None if config.max_ops_per_s is None else Throttle(config.max_ops_per_s)
+
+    deadline = None if config.deadline_s is None else start + config.deadline_s
+
+    def out_of_budget() -> bool:
+        if config.max_entries is not None and entries >= config.max_entries:
+            return True
+        return deadline is not None and time.perf_counter() >= deadline
 
-    def walk_dir(current: Path, depth: int) -> Node:
-        nonlocal files, dirs, errors
+    # Directories being listed, innermost last. The iterator is None when the
+    # directory is not listed (depth limit or scandir error).
+    stack: list[tuple[Node, os.ScandirIterator[str] | None, int]] = []
 
-        node = Node(path=current, is_dir=True)
-        dirs += 1
+    def open_dir(node: Node, depth: int) -> ScanError | None:
+        nonlocal errors
 
         if config.max_depth is not None and depth >= config.max_depth:
-            return node
+            node.truncated = node.incomplete = True
+            stack.append((node, None, depth))
+            return None
 
-        total = 0
+        started = throttle.acquire() if throttle is not None else 0.0
         try:
-            with os.scandir(current) as it:
-                for entry in it:
-                    child = walk_entry(entry, depth + 1)
-                    node.children.append(child)
-                    total += child.size_bytes
+            it = os.scandir(node.path)
         except (PermissionError, FileNotFoundError, NotADirectoryError, OSError) as exc:
-            node.error = f"{type(exc).__name__}: {exc}"
+            node.error = _describe(exc)
             errors += 1
+            stack.append((node, None, depth))
+            return ScanError(path=node.path, message=node.error)
+        if throttle is not None:
+            throttle.record(started)
 
-        node.size_bytes = total
-        return node
+        stack.append((node, it, depth))
+        return None
 
-    def walk_file(current: Path) -> Node:
-        nonlocal files, errors
+    if config.on_visit is not None:
+        config.on_visit(path)
 
-        files += 1
+    try:
         try:
-            stat = current.stat(follow_symlinks=config.follow_symlinks)
-            return Node(path=current, is_dir=False, size_bytes=stat.st_size)
+            if path.is_symlink() and not config.follow_symlinks:
+                files += 1
+                root = Node(path=path, is_dir=False, size_bytes=0)
+            elif path.is_dir():
+                root = Node(
+                    path=path, is_dir=True, age_bytes=[0] * AGE_BUCKET_COUNT, owner_bytes={}
+                )
+                dirs += 1
+            else:
+                files += 1
+                stat = path.stat(follow_symlinks=config.follow_symlinks)
+                root = Node(
+                    path=path,
+                    is_dir=False,
+                    size_bytes=stat.st_size,
+                    alloc_bytes=_allocated(stat),
+                    mtime=int(stat.st_mtime),
+                    atime=int(stat.st_atime),
+                    uid=stat.st_uid,
+                    gid=stat.st_gid,
+                )
         except (PermissionError, FileNotFoundError, OSError) as exc:
             errors += 1
-            return Node(path=current, is_dir=False, size_bytes=0, error=f"{type(exc).__name__}: {exc}")
+            root = Node(path=path, is_dir=False, size_bytes=0, error=_describe(exc))
+            yield ScanError(path=path, message=root.error)
 
-    def walk_entry(entry: os.DirEntry[str], depth: int) -> Node:
-        nonlocal files, errors
+        if root.is_dir:
+            yield DirEntered(path=path, depth=0)
+            failed = open_dir(root, 0)
+            if failed is not None:
+                yield failed
+        elif file_events:
+            yield FileScanned(node=root, depth=0)
 
-        child_path = Path(entry.path)
-        if config.on_visit is not None:
-            config.on_visit(child_path)
+        while stack:
+            node, it, depth = stack[-1]
 
-        try:
-            if entry.is_symlink() and not config.follow_symlinks:
-                files += 1
-                return Node(path=child_path, is_dir=False, size_bytes=0)
+            entry = None
+            if it is not None:
+                try:
+                    entry = next(it, None)
+                except (PermissionError, FileNotFoundError, OSError) as exc:
+                    node.error = _describe(exc)
+                    errors += 1
+                    yield ScanError(path=node.path, message=node.error)
+                if entry is not None and out_of_budget():
+                    node.truncated = node.incomplete = True
+                    entry = None
 
-            if entry.is_dir(follow_symlinks=config.follow_symlinks):
-                return walk_dir(child_path, depth)
+            if entry is None:
+                if it is not None:
+                    it.close()
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    parent.size_bytes += node.size_bytes
+                    parent.alloc_bytes += node.alloc_bytes
+                    if node.incomplete:
+                        parent.incomplete = True
+                    if node.mtime > parent.mtime:
+                        parent.mtime = node.mtime
+                    if node.atime > parent.atime:
+                        parent.atime = node.atime
+                    parent_ages = parent.age_bytes
+                    for i, b in enumerate(node.age_bytes):
+                        parent_ages[i] += b
+                    parent_owners = parent.owner_bytes
+                    for key, b in node.owner_bytes.items():
+                        parent_owners[key] = parent_owners.get(key, 0) + b
+                yield DirCompleted(node=node, depth=depth)
+                continue
 
-            files += 1
-            stat = entry.stat(follow_symlinks=config.follow_symlinks)
-            return Node(path=child_path, is_dir=False, size_bytes=stat.st_size)
-        except (PermissionError, FileNotFoundError, OSError) as exc:
-            errors += 1
-            return Node(path=child_path, is_dir=False, size_bytes=0, error=f"{type(exc).__name__}: {exc}")
+            entries += 1
+            child_path = Path(entry.path)
+            if config.on_visit is not None:
+                config.on_visit(child_path)
 
-    if config.on_visit is not None:
-        config.on_visit(path)
+            tick = time.perf_counter()
+            if tick >= next_progress:
+                next_progress = tick + PROGRESS_INTERVAL_S
+                since, since_entries = last_progress
+                last_progress = (tick, entries)
+                yield ScanProgress(
+                    files=files,
+                    dirs=dirs,
+                    errors=errors,
+                    entries=entries,
+                    elapsed_s=tick - start,
+                    current=child_path,
+                    entries_per_s=(entries - since_entries) / (tick - since),
+                    limit_per_s=None if throttle is None else throttle.rate,
+                )
 
-    try:
-        if path.is_symlink() and not config.follow_symlinks:
-            files += 1
-            root = Node(path=path, is_dir=False, size_bytes=0)
-        elif path.is_dir():
-            root = walk_dir(path, 0)
-        else:
-            root = walk_file(path)
-    except (PermissionError, FileNotFoundError, OSError) as exc:
-        errors += 1
-        root = Node(path=path, is_dir=False, size_bytes=0, error=f"{type(exc).__name__}: {exc}")
+            try:
+                if entry.is_symlink() and not config.follow_symlinks:
+                    files += 1
+                    child = Node(path=child_path, is_dir=False, size_bytes=0)
+                elif entry.is_dir(follow_symlinks=config.follow_symlinks):
+                    child = Node(
+                        path=child_path,
+                        is_dir=True,
+                        age_bytes=[0] * AGE_BUCKET_COUNT,
+                        owner_bytes={},
+                    )
+                    dirs += 1
+                    node.children.append(child)
+                    yield DirEntered(path=child_path, depth=depth + 1)
+                    failed = open_dir(child, depth + 1)
+                    if failed is not None:
+                        yield failed
+                    continue
+                else:
+                    files += 1
+                    started = throttle.acquire() if throttle is not None else 0.0
+                    stat = entry.stat(follow_symlinks=config.follow_symlinks)
+                    if throttle is not None:
+                        throttle.record(started)
+                    child = Node(
+                        path=child_path,
+                        is_dir=False,
+                        size_bytes=stat.st_size,
+                        alloc_bytes=_allocated(stat),
+                        mtime=int(stat.st_mtime),
+                        atime=int(stat.st_atime),
+                        uid=stat.st_uid,
+                        gid=stat.st_gid,
+                    )
+            except (PermissionError, FileNotFoundError, OSError) as exc:
+                errors += 1
+                child = Node(path=child_path, is_dir=False, size_bytes=0, error=_describe(exc))
+                yield ScanError(path=child_path, message=child.error)
+
+            node.children.append(child)
+            node.alloc_bytes += child.alloc_bytes
+            if child.size_bytes:
+                node.size_bytes += child.size_bytes
+                node.age_bytes[age_bucket(child.mtime, now)] += child.size_bytes
+                key = owner_key(child.uid, child.gid)
+                node.owner_bytes[key] = node.owner_bytes.get(key, 0) + child.size_bytes
+            if child.mtime > node.mtime:
+                node.mtime = child.mtime
+            if child.atime > node.atime:
+                node.atime = child.atime
+            if file_events:
+                yield FileScanned(node=child, depth=depth + 1)
+    finally:
+        for _, it, _ in stack:
+            if it is not None:
+                it.close()
 
     elapsed = time.perf_counter() - start
-    return ScanResult(root=root, stats=ScanStats(files=files, dirs=dirs, errors=errors), elapsed_s=elapsed)
+    yield ScanFinished(
+        result=ScanResult(
+            root=root,
+            stats=ScanStats(files=files, dirs=dirs, errors=errors),
+            elapsed_s=elapsed,
+            scanned_at=now,
+        )
+    )
+
+
+def scan_path(path: Path, config: ScanConfig) -> ScanResult:
+    last = deque(iter_scan(path, config, file_events=False), maxlen=1)[0]
+    assert isinstance(last, ScanFinished)
+    return last.result
+
+
+async def aiter_scan(
+    path: Path, config: ScanConfig, *, file_events: bool = True, batch_size: int = 256
+) -> AsyncIterator[ScanEvent]:
+    """Async form of `iter_scan`.
+
+    The walk runs in a worker thread, `batch_size` events at a time, and the next
+    batch is only requested once the consumer has taken the previous one.
+    """
+
+    # Deferred: asyncio alone costs more import time than the rest of the scanner.
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    events = iter_scan(path, config, file_events=file_events)
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mezdisk-scan")
+    try:
+        while batch := await loop.run_in_executor(pool, lambda: list(islice(events, batch_size))):
+            for event in batch:
+                yield event
+    finally:
+        # Queued behind any batch still running, so it never races the walk. Not waited
+        # for: the worker finishes that batch and the close on its own, off the loop.
+        pool.submit(events.close)
+        pool.shutdown(wait=False)
+
+
+def deepen_scan(path: Path, config: ScanConfig, *, initial_depth: int = 1) -> Iterator[ScanResult]:
+    """Scan `path` to `initial_depth`, then deepen the largest unfinished subtrees first.
+
+    Each yielded `ScanResult` shares the same (growing) tree. `config.max_depth` is
+    ignored; `deadline_s` / `max_entries` bound the whole run, and the last result
+    still has `incomplete` nodes if the budget ran out.
+    """
+
+    start = time.perf_counter()
+    result = scan_path(path, replace(config, max_depth=max(1, initial_depth)))
+    root = result.root
+    files, dirs, errors = result.stats.files, result.stats.dirs, result.stats.errors
+    yield result
+
+    heap: list[tuple[int, int, Node, tuple[Node, ...]]] = []
+    tie = count()
+    # Incomplete children per listed directory (by id), so finishing a subtree can
+    # clear its ancestors' `incomplete` without going over all their other children.
+    unfinished: dict[int, int] = {}
+
+    def push_frontier(node: Node, chain: tuple[Node, ...]) -> None:
+        stack = [(node, chain)]
+        while stack:
+            n, ancestors = stack.pop()
+            if not n.is_dir or not n.incomplete:
+                continue
+            if not n.children and n.error is None:
+                priority = ancestors[-1].size_bytes if ancestors else 0
+                heapq.heappush(heap, (-priority, next(tie), n, ancestors))
+                continue
+            unfinished[id(n)] = sum(c.incomplete for c in n.children)
+            stack.extend((c, ancestors + (n,)) for c in n.children)
+
+    push_frontier(root, ())
+
+    while heap:
+        budget = config
+        if config.deadline_s is not None:
+            remaining = config.deadline_s - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            budget = replace(budget, deadline_s=remaining)
+        if config.max_entries is not None:
+            remaining_entries = config.max_entries - (files + dirs)
+            if remaining_entries <= 0:
+                break
+            budget = replace(budget, max_entries=remaining_entries)
+
+        _, _, node, chain = heapq.heappop(heap)
+        sub = scan_path(node.path, replace(budget, max_depth=1))
+        files += sub.stats.files
+        dirs += sub.stats.dirs - 1
+        errors += sub.stats.errors
+
+        node.children = sub.root.children
+        node.error = sub.root.error
+        node.truncated = sub.root.truncated
+        node.rollup(result.scanned_at)
+        # `node` had no children before, so its totals are exactly what each ancestor
+        # gains; re-totalling the ancestors would cost their whole width every step.
+        finished = not node.incomplete
+        for ancestor in reversed(chain):
+            ancestor.size_bytes += node.size_bytes
+            ancestor.alloc_bytes += node.alloc_bytes
+            ancestor.mtime = max(ancestor.mtime, node.mtime)
+            ancestor.atime = max(ancestor.atime, node.atime)
+            ancestor_ages = ancestor.age_bytes
+            for i, b in enumerate(node.age_bytes):
+                ancestor_ages[i] += b
+            ancestor_owners = ancestor.owner_bytes
+            for key, b in node.owner_bytes.items():
+                ancestor_owners[key] = ancestor_owners.get(key, 0) + b
+            if finished:
+                unfinished[id(ancestor)] -= 1
+                if unfinished[id(ancestor)] == 0 and not ancestor.truncated:
+                    ancestor.incomplete = False
+                else:
+                    finished = False
 
+        push_frontier(node, chain)
+        yield ScanResult(
+            root=root,
+            stats=ScanStats(files=files, dirs=dirs, errors=errors),
+            elapsed_s=time.perf_counter() - start,
+            scanned_at=result.scanned_at,
+        )
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from .filetypes import file_style
+from .models import Node, ScanResult
+from .query import QueryError, largest_matches, parse_query
+from .scan import ScanConfig, scan_path
+from .snapshot import node_summary, node_to_dict, result_to_dict
+from .util import iter_leaf_files, largest_children, largest_leaf_files, largest_nodes
+
+# Protocol: one JSON object per line in each direction. A request is
+# {"op": <name>, ...args}; the reply is {"ok": true, "result": ...} or
+# {"ok": false, "error": "..."}. A connection may carry any number of requests.
+
+
+class RequestError(Exception):
+    """A malformed or unanswerable request; sent back as the error reply."""
+
+
+def find_node(root: Node, path: str | None) -> Node:
+    """Resolve `path` (absolute, or relative to the scan root) to a node."""
+
+    if not path:
+        return root
+    if not isinstance(path, str):
+        raise RequestError("path must be a string")
+    target = Path(path)
+    if not target.is_absolute():
+        target = root.path / target
+    if target == root.path:
+        return root
+    try:
+        parts = target.relative_to(root.path).parts
+    except ValueError:
+        raise RequestError(f"{path} is outside the scanned path {root.path}") from None
+
+    current = root
+    for part in parts:
+        for child in current.children:
+            if child.path.name == part:
+                current = child
+                break
+        else:
+            raise RequestError(f"{path} is not in the scan result")
+    return current
+
+
+def type_breakdown(node: Node) -> list[dict[str, Any]]:
+    totals: dict[str, int] = {}
+    for f in iter_leaf_files(node):
+        label = file_style(f.path).label
+        totals[label] = totals.get(label, 0) + max(0, f.size_bytes)
+    return [
+        {"type": label, "size_bytes": size}
+        for label, size in sorted(totals.items(), key=lambda t: t[1], reverse=True)
+    ]
+
+
+def _count_arg(request: dict[str, Any], name: str, default: int) -> int:
+    value = request.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise RequestError(f"{name} must be a non-negative integer")
+    return value
+
+
+class ScanService:
+    """Keeps one `ScanResult` resident, refreshes it, and answers queries about it."""
+
+    def __init__(self, path: Path, config: ScanConfig, *, refresh_s: float | None) -> None:
+        self.path = path
+        self.config = config
+        self.refresh_s = refresh_s
+
+        self._result: ScanResult | None = None
+        self._generation = 0
+        self._scanning = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        # Type breakdowns walk whole subtrees; keep them until the next scan.
+        self._types_cache: dict[str, list[dict[str, Any]]] = {}
+
+        self._ops: dict[str, Callable[[ScanResult, dict[str, Any]], Any]] = {
+            "size": self._op_size,
+            "children": self._op_children,
+            "largest": self._op_largest,
+            "types": self._op_types,
+            "query": self._op_query,
+            "snapshot": self._op_snapshot,
+        }
+
+    def run_refresh_loop(self) -> None:
+        while not self._stopping.is_set():
+            # Cleared before scanning, so a "refresh" sent during the scan starts another.
+            self._wake.clear()
+            self.rescan()
+            self._wake.wait(self.refresh_s)
+
+    def rescan(self) -> None:
+        with self._lock:
+            self._scanning = True
+        try:
+            result = scan_path(self.path, self.config)
+        finally:
+            with self._lock:
+                self._scanning = False
+        with self._lock:
+            self._result = result
+            self._generation += 1
+            self._types_cache = {}
+        self._ready.set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+    def handle(self, request: dict[str, Any], *, wait_s: float | None = None) -> Any:
+        op = request.get("op")
+        if op == "status":
+            return self._status()
+        if op == "refresh":
+            self._wake.set()
+            return self._status()
+        handler = self._ops.get(str(op))
+        if handler is None:
+            raise RequestError(f"unknown op: {op!r}")
+        if not self._ready.wait(wait_s):
+            raise RequestError("first scan still running")
+        with self._lock:
+            result = self._result
+        assert result is not None
+        return handler(result, request)
+
+    def _status(self) -> dict[str, Any]:
+        with self._lock:
+            result = self._result
+            status: dict[str, Any] = {
+                "path": str(self.path),
+                "generation": self._generation,
+                "scanning": self._scanning,
+                "refresh_s": self.refresh_s,
+            }
+        if result is not None:
+            status.update(
+                scanned_at=result.scanned_at,
+                elapsed_s=result.elapsed_s,
+                files=result.stats.files,
+                dirs=result.stats.dirs,
+                errors=result.stats.errors,
+                size_bytes=result.root.size_bytes,
+            )
+        return status
+
+    def _op_size(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        return node_summary(find_node(result.root, request.get("path")))
+
+    def _op_children(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        node = find_node(result.root, request.get("path"))
+        k = _count_arg(request, "k", 20)
+        children, rest_count, rest_size = largest_children(node, max_items=k)
+        return {
+            **node_summary(node),
+            "children": [node_summary(c) for c in children],
+            "rest_count": rest_count,
+            "rest_size_bytes": rest_size,
+        }
+
+    def _op_largest(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        node = find_node(result.root, request.get("path"))
+        k = _count_arg(request, "k", 20)
+        if request.get("files_only"):
+            items, _ = largest_leaf_files(node, max_items=k)
+        else:
+            items = largest_nodes(node, max_items=k)
+        return [node_summary(n) for n in items]
+
+    def _op_query(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        node = find_node(result.root, request.get("path"))
+        expr = request.get("expr")
+        if not isinstance(expr, str):
+            raise RequestError("expr must be a query string")
+        query = parse_query(expr, root=result.root.path)
+        matches = largest_matches(
+            node, query, now=result.scanned_at, max_items=_count_arg(request, "k", 50)
+        )
+        return [node_summary(n) for n in matches]
+
+    def _op_types(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        node = find_node(result.root, request.get("path"))
+        key = str(node.path)
+        with self._lock:
+            cached = self._types_cache.get(key)
+        if cached is None:
+            cached = type_breakdown(node)
+            with self._lock:
+                if self._result is result:
+                    self._types_cache[key] = cached
+        return cached
+
+    def _op_snapshot(self, result: ScanResult, request: dict[str, Any]) -> Any:
+        if request.get("path"):
+            return node_to_dict(find_node(result.root, request["path"]))
+        return result_to_dict(result)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: ScanServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise RequestError("request must be a JSON object")
+                reply = {"ok": True, "result": self.server.service.handle(request)}
+            except (RequestError, QueryError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+                reply = {"ok": False, "error": str(exc)}
+            self.wfile.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+            self.wfile.flush()
+
+
+class ScanServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: ScanService) -> None:
+        self.service = service
+        self.socket_path = socket_path
+        _claim_socket_path(socket_path)
+        super().__init__(str(socket_path), _Handler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+def _claim_socket_path(socket_path: Path) -> None:
+    """Remove a stale socket file, refusing to steal one that is still being served.
+
+    Anything at `socket_path` that is not a socket is left alone.
+    """
+
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{socket_path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except OSError:
+        socket_path.unlink()
+    else:
+        raise OSError(f"another mezdisk server is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+
+def serve(path: Path, socket_path: Path, config: ScanConfig, *, refresh_s: float | None) -> None:
+    """Scan `path`, keep the result resident and answer queries on `socket_path`.
+
+    Rescans every `refresh_s` seconds (never if None) or when a client sends
+    "refresh". Runs until interrupted.
+    """
+
+    service = ScanService(path, config, refresh_s=refresh_s)
+    refresher = threading.Thread(target=service.run_refresh_loop, daemon=True, name="rescan")
+    with ScanServer(socket_path, service) as server:
+        refresher.start()
+        try:
+            server.serve_forever()
+        finally:
+            service.stop()
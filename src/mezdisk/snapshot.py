@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from .models import Node, ScanResult, ScanStats
+
+# JSON form of a scan result. Nodes are dicts with short keys and default values
+# left out; only the root carries a full path, children carry their name.
+# `node_summary` is the flat, readable form of one node used in query replies.
+
+
+def node_summary(node: Node) -> dict[str, Any]:
+    out: dict[str, Any] = {
+        "path": str(node.path),
+        "is_dir": node.is_dir,
+        "size_bytes": node.size_bytes,
+    }
+    if node.incomplete:
+        out["incomplete"] = True
+    if node.estimated:
+        out["estimated"] = True
+        out["margin_bytes"] = node.margin_bytes
+    if node.error:
+        out["error"] = node.error
+    return out
+
+
+def node_to_dict(node: Node, *, full_path: bool = True) -> dict[str, Any]:
+    out: dict[str, Any] = {"p": str(node.path) if full_path else node.path.name}
+    if node.is_dir:
+        out["d"] = 1
+    if node.size_bytes:
+        out["s"] = node.size_bytes
+    if node.alloc_bytes:
+        out["b"] = node.alloc_bytes
+    if node.error is not None:
+        out["e"] = node.error
+    if node.incomplete:
+        out["i"] = 1
+    if node.truncated:
+        out["t"] = 1
+    if node.mtime:
+        out["m"] = node.mtime
+    if node.atime:
+        out["a"] = node.atime
+    if node.uid != -1:
+        out["u"] = node.uid
+    if node.gid != -1:
+        out["g"] = node.gid
+    if node.age_bytes is not None:
+        out["ab"] = node.age_bytes
+    if node.owner_bytes is not None:
+        out["ob"] = [[key, size] for key, size in node.owner_bytes.items()]
+    if node.estimated:
+        out["est"] = node.margin_bytes
+    if node.children:
+        out["c"] = [node_to_dict(c, full_path=False) for c in node.children]
+    return out
+
+
+def node_from_dict(data: dict[str, Any], parent: Path | None = None) -> Node:
+    path = Path(data["p"]) if parent is None else parent / data["p"]
+    node = Node(
+        path=path,
+        is_dir=bool(data.get("d", 0)),
+        size_bytes=data.get("s", 0),
+        alloc_bytes=data.get("b", 0),
+        error=data.get("e"),
+        incomplete=bool(data.get("i", 0)),
+        truncated=bool(data.get("t", 0)),
+        mtime=data.get("m", 0),
+        atime=data.get("a", 0),
+        age_bytes=data.get("ab"),
+        uid=data.get("u", -1),
+        gid=data.get("g", -1),
+        estimated="est" in data,
+        margin_bytes=data.get("est", 0),
+    )
+    if "ob" in data:
+        node.owner_bytes = {key: size for key, size in data["ob"]}
+    node.children = [node_from_dict(c, path) for c in data.get("c", ())]
+    return node
+
+
+def result_to_dict(result: ScanResult) -> dict[str, Any]:
+    stats = result.stats
+    return {
+        "root": node_to_dict(result.root),
+        "stats": {"files": stats.files, "dirs": stats.dirs, "errors": stats.errors},
+        "elapsed_s": result.elapsed_s,
+        "scanned_at": result.scanned_at,
+    }
+
+
+def result_from_dict(data: dict[str, Any]) -> ScanResult:
+    return ScanResult(
+        root=node_from_dict(data["root"]),
+        stats=ScanStats(**data["stats"]),
+        elapsed_s=data["elapsed_s"],
+        scanned_at=data["scanned_at"],
+    )
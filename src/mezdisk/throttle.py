@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from collections.abc import Callable
+
+# Throttling for scans on busy hosts: a token bucket caps metadata syscalls
+# (directory opens and stats) per second, and the allowed rate follows AIMD -- halved
+# while syscall latency is well above its usual level, then raised step by step
+# back to the cap once it settles.
+
+# Tokens the bucket can hold, in seconds' worth of the current rate.
+BURST_S = 0.05
+# How often the rate may change, and by how much per step when recovering.
+ADJUST_INTERVAL_S = 0.25
+RECOVER_STEP = 0.05
+# Never throttle below this fraction of the cap.
+MIN_RATE_FRACTION = 0.02
+# Latency counts as raised once the recent average exceeds the baseline by this
+# factor and is above an absolute floor (page-cache hits are microseconds and jitter).
+CONGESTED_FACTOR = 2.0
+CONGESTED_FLOOR_S = 0.0005
+
+
+class Throttle:
+    """Paces metadata syscalls to at most `max_ops_per_s`, backing off on high latency.
+
+    Call `acquire()` before each syscall and `record(started)` with its return value
+    right after it.
+    """
+
+    def __init__(
+        self,
+        max_ops_per_s: float,
+        *,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if max_ops_per_s <= 0:
+            raise ValueError("max_ops_per_s must be positive")
+        self.max_rate = max_ops_per_s
+        self.rate = max_ops_per_s
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = 1.0
+        self._last = clock()
+        self._next_adjust = self._last + ADJUST_INTERVAL_S
+        # Exponentially weighted latency averages: a slow one for "usual", a fast one
+        # for "right now".
+        self._baseline_s: float | None = None
+        self._recent_s = 0.0
+
+    def acquire(self) -> float:
+        """Wait for a token; returns the time to pass to `record`."""
+
+        now = self._clock()
+        capacity = max(1.0, self.rate * BURST_S)
+        self._tokens = min(capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens < 1.0:
+            self._sleep((1.0 - self._tokens) / self.rate)
+            now = self._clock()
+            self._tokens = min(capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+        self._tokens -= 1.0
+        return now
+
+    def record(self, started: float) -> None:
+        now = self._clock()
+        latency = now - started
+        if self._baseline_s is None:
+            self._baseline_s = self._recent_s = latency
+        else:
+            # The baseline follows drops quickly but rises slowly, so sustained slowness
+            # keeps counting as congestion for a while before it becomes the new normal.
+            weight = 0.05 if latency < self._baseline_s else 0.001
+            self._baseline_s += (latency - self._baseline_s) * weight
+            self._recent_s += (latency - self._recent_s) * 0.2
+
+        if now < self._next_adjust:
+            return
+        self._next_adjust = now + ADJUST_INTERVAL_S
+        if self.congested:
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+        else:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVER_STEP)
+
+    @property
+    def congested(self) -> bool:
+        if self._baseline_s is None:
+            return False
+        return self._recent_s > max(self._baseline_s * CONGESTED_FACTOR, CONGESTED_FLOOR_S)
+
+
+# ioprio_set(2) syscall numbers; glibc has no wrapper.
+_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "riscv64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "s390x": 282,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+
+def lower_priority() -> list[str]:
+    """Best effort: lowest CPU priority and (on Linux) the idle I/O class.
+
+    Linux applies both to the calling thread and new threads inherit them, so call
+    this before starting any scan threads. Returns what was applied.
+    """
+
+    applied = []
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, 19)
+        applied.append("nice 19")
+    except (AttributeError, OSError):
+        pass
+
+    if sys.platform.startswith("linux"):
+        import ctypes
+
+        number = _IOPRIO_SET.get(os.uname().machine)
+        if number is not None:
+            libc = ctypes.CDLL(None, use_errno=True)
+            ioprio = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+            if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, ioprio) == 0:
+                applied.append("idle I/O class")
+    return applied
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
 
+from rich.console import Group
 from rich.table import Table
-from textual import on
+from textual import on, work
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical
-from textual.widgets import Footer, Header, Static, Tree
+from textual.widgets import Footer, Header, Input, Static, Tree
 
+from .age import age_days
+from .estimate import apply_rescan
 from .filetypes import file_style
 from .models import Node, ScanResult
-from .treemap import Treemap, TreemapItem
-from .util import format_bytes, largest_leaf_files
+from .mounts import Reconciliation, reconcile
+from .owners import OwnerFilter, usage_by_owner
+from .query import QueryError, filter_tree, parse_query
+from .render import build_age_legend, build_owner_table, build_treemap_items
+from .scan import ScanConfig, scan_path
+from .treemap import Treemap
+from .util import Weight, format_bytes, format_size, largest_nodes, stale_files
 
 
 @dataclass(frozen=True, slots=True)
@@ -20,6 +28,9 @@ class TuiConfig:
     treemap_height: int = 20
     treemap_items: int = 35
     largest_items: int = 20
+    cold_days: int = 180
+    color_by_age: bool = False
+    owner: OwnerFilter | None = None
 
 
 class MezDiskApp(App[None]):
@@ -42,6 +53,15 @@ class MezDiskApp(App[None]):
         border: round $primary;
     }
 
+    #filter {
+        height: 3;
+    }
+
+    #owners {
+        height: auto;
+        max-height: 8;
+    }
+
     #bottom {
         height: 16;
         border: round $primary;
@@ -50,37 +70,67 @@ class MezDiskApp(App[None]):
 
     BINDINGS = [
         ("q", "quit", "Quit"),
+        ("a", "toggle_age", "Age view"),
+        ("o", "cycle_owner", "Owner filter"),
+        ("r", "refine", "Exact rescan"),
+        ("slash", "focus_filter", "Filter"),
     ]
 
-    def __init__(self, *, result: ScanResult, root_path: Path, config: TuiConfig) -> None:
+    def __init__(
+        self,
+        *,
+        result: ScanResult,
+        root_path: Path,
+        config: TuiConfig,
+        scan_config: ScanConfig | None = None,
+        reconciliation: Reconciliation | None = None,
+    ) -> None:
         super().__init__()
         self._result = result
         self._root_path = root_path
         self._config = config
+        # Used to rescan estimated/partial subtrees exactly on request.
+        self._scan_config = scan_config or ScanConfig()
+        self._refining = False
+        # Filesystem usage vs. the scan, when the scan root is a mount point.
+        self._reconciliation = reconciliation
 
         self._node_by_key: dict[str, Node] = {}
+        self._age_view = config.color_by_age
+        self._selected = result.root
+        self._owner = config.owner
+        # Root of what the tree/treemap show: the scan, or a filtered copy of it.
+        self._view_root = result.root
+        self._filter: str | None = None
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
+        yield Input(placeholder="Filter, e.g. ext:log size>1G age>30d  (/ to focus)", id="filter")
         with Horizontal(id="main"):
             yield Tree("MezDisk", id="left")
             with Vertical(id="right"):
                 yield Static(id="treemap")
+                yield Static(id="owners")
         yield Static(id="bottom")
         yield Footer()
 
     def on_mount(self) -> None:
         self.title = "MezDisk"
-        self.sub_title = str(self._root_path)
+        self._update_sub_title()
+        self._load_tree()
+        self._select_node(self._view_root)
+        self.query_one(Tree).focus()
 
+    def _load_tree(self) -> None:
         tree = self.query_one(Tree)
-        tree.root.label = f"{self._root_path}  ({format_bytes(self._result.root.size_bytes)})"
+        tree.clear()
+        self._node_by_key.clear()
+        tree.root.label = f"{self._root_path}  ({format_size(self._view_root)})"
         tree.root.data = str(self._root_path)
-        self._node_by_key[str(self._root_path)] = self._result.root
+        self._node_by_key[str(self._root_path)] = self._view_root
 
         tree.root.expand()
-        self._populate_tree(tree.root, self._result.root, max_depth=4)
-        self._select_node(self._result.root)
+        self._populate_tree(tree.root, self._view_root, max_depth=4)
 
     def _populate_tree(self, tree_node: Tree.Node, node: Node, *, max_depth: int) -> None:
         if max_depth <= 0:
@@ -89,11 +139,13 @@ class MezDiskApp(App[None]):
         children = sorted(node.children, key=lambda c: c.size_bytes, reverse=True)
         for child in children:
             key = str(child.path)
-            label = f"{child.name}  {format_bytes(child.size_bytes)}"
+            label = f"{child.name}  {format_size(child)}"
             if child.is_dir:
                 label = f"[bold]{label}[/]"
             else:
                 label = f"[{file_style(child.path).color}]{label}[/]"
+            if child.incomplete:
+                label += "  [yellow](partial)[/]"
             if child.error:
                 label += f"  [red]! {child.error}[/]"
 
@@ -118,53 +170,171 @@ class MezDiskApp(App[None]):
         self._populate_tree(tree_node, node, max_depth=2)
 
     def _select_node(self, node: Node) -> None:
+        self._selected = node
         self._render_treemap(node)
-        self._render_largest_table(node)
+        self.query_one("#owners", Static).update(build_owner_table(node, max_rows=5))
+        if self._age_view:
+            self._render_stale_table(node)
+        else:
+            self._render_largest_table(node)
+
+    def action_toggle_age(self) -> None:
+        self._age_view = not self._age_view
+        self._select_node(self._selected)
+
+    def action_cycle_owner(self) -> None:
+        # All owners -> each user on the volume (largest first) -> all owners.
+        uids = [uid for uid, _ in usage_by_owner(self._result.root)]
+        current = self._owner.uid if self._owner is not None else None
+        if current in uids and uids.index(current) + 1 < len(uids):
+            self._owner = OwnerFilter(uid=uids[uids.index(current) + 1])
+        elif current is None and uids:
+            self._owner = OwnerFilter(uid=uids[0])
+        else:
+            self._owner = None
+        self._update_sub_title()
+        self._select_node(self._selected)
+
+    def action_focus_filter(self) -> None:
+        self.query_one("#filter", Input).focus()
+
+    @on(Input.Submitted, "#filter")
+    def _on_filter_submitted(self, event: Input.Submitted) -> None:
+        # An empty box clears the filter; a bad or empty query keeps the current view.
+        text = event.value.strip()
+        view_root = self._result.root
+        if text:
+            try:
+                query = parse_query(text, root=self._result.root.path)
+            except QueryError as exc:
+                self.notify(str(exc), severity="error")
+                return
+            filtered = filter_tree(self._result.root, query, now=self._result.scanned_at)
+            if filtered is None:
+                self.notify(f"No files match {text!r}", severity="warning")
+                return
+            view_root = filtered
+        self._filter = text or None
+        self._view_root = view_root
+        self._update_sub_title()
+        self._load_tree()
+        self._select_node(self._view_root)
+        self.query_one(Tree).focus()
+
+    def action_refine(self) -> None:
+        node = self._selected
+        if self._refining or not node.is_dir or not (node.estimated or node.incomplete):
+            return
+        if self._filter is not None:
+            # Filtered views are copies; rescanning must target the real tree.
+            self.notify("Clear the filter before rescanning", severity="warning")
+            return
+        self._refining = True
+        self.notify(f"Rescanning {node.path} exactly…")
+        self._refine(node)
+
+    @work(thread=True, exclusive=True, exit_on_error=False)
+    def _refine(self, node: Node) -> None:
+        # Only the scan runs here; the tree being drawn is changed on the UI thread.
+        try:
+            sub = scan_path(node.path, replace(self._scan_config, max_depth=None))
+            self.call_from_thread(self._on_refined, node, sub)
+        except Exception as exc:
+            self.call_from_thread(self.notify, f"Rescan failed: {exc}", severity="error")
+            raise
+        finally:
+            self.call_from_thread(self._end_refine)
+
+    def _end_refine(self) -> None:
+        self._refining = False
+
+    def _on_refined(self, node: Node, sub: ScanResult) -> None:
+        result = apply_rescan(self._result, node, sub)
+        self._result = result
+        self._view_root = result.root
+        if self._reconciliation is not None:
+            self._reconciliation = reconcile(result)
+        self._update_sub_title()
+        self._load_tree()
+        self._select_node(node)
+
+    def _update_sub_title(self) -> None:
+        sub_title = str(self._root_path)
+        if self._result.root.incomplete:
+            sub_title += "  (partial scan)"
+        if self._result.root.estimated:
+            sub_title += "  (estimated, press r on a node to rescan it exactly)"
+        if self._owner is not None:
+            sub_title += f"  ({self._owner.describe()})"
+        if self._filter is not None:
+            sub_title += f"  (filter: {self._filter})"
+        if self._reconciliation is not None and self._reconciliation.unaccounted_bytes > 0:
+            missing = format_bytes(self._reconciliation.unaccounted_bytes)
+            sub_title += f"  ({missing} used on the filesystem but not found by the scan)"
+        self.sub_title = sub_title
 
     def _render_treemap(self, node: Node) -> None:
         widget = self.query_one("#treemap", Static)
 
-        selected_files, other_size = largest_leaf_files(node, max_items=self._config.treemap_items)
-        if not selected_files and other_size <= 0:
+        items = build_treemap_items(
+            node,
+            max_items=self._config.treemap_items,
+            age_reference=self._result.scanned_at if self._age_view else None,
+            owner=self._owner,
+            unaccounted_bytes=self._unaccounted_for(node),
+        )
+        if not items:
             widget.update("(no files)")
             return
 
-        def label_for(f: Node) -> str:
-            if node.is_dir:
-                try:
-                    return str(f.path.relative_to(node.path))
-                except ValueError:
-                    return str(f.path)
-            return f.name
-
-        items: list[TreemapItem] = []
-        for f in selected_files:
-            items.append(
-                TreemapItem(
-                    label=label_for(f), value=float(f.size_bytes), color=file_style(f.path).color
-                )
+        treemap = Treemap(items, height=self._config.treemap_height)
+        if self._age_view:
+            widget.update(Group(treemap, build_age_legend()))
+        else:
+            widget.update(treemap)
+
+    def _unaccounted_for(self, node: Node) -> int:
+        # Only the unfiltered scan root stands for the whole filesystem.
+        if self._reconciliation is None or node is not self._result.root:
+            return 0
+        return self._reconciliation.unaccounted_bytes
+
+    def _render_stale_table(self, node: Node) -> None:
+        widget = self.query_one("#bottom", Static)
+
+        now = self._result.scanned_at
+        days = self._config.cold_days
+        items = stale_files(
+            node,
+            min_age_days=days,
+            now=now,
+            max_items=self._config.largest_items,
+            weight=self._weight(),
+        )
+
+        table = Table(
+            title=f"Largest not modified in {days}d", show_header=True, header_style="bold"
+        )
+        table.add_column("Path", overflow="fold")
+        table.add_column("Size", justify="right")
+        table.add_column("Age", justify="right")
+
+        for item in items:
+            table.add_row(
+                str(item.path), format_bytes(item.size_bytes), f"{age_days(item.mtime, now):.0f}d"
             )
 
-        if other_size > 0:
-            items.append(TreemapItem(label="Other", value=float(other_size), color="grey37"))
+        widget.update(table)
 
-        widget.update(Treemap(items, height=self._config.treemap_height))
+    def _weight(self) -> Weight | None:
+        return self._owner.weight if self._owner is not None else None
 
     def _render_largest_table(self, node: Node) -> None:
         widget = self.query_one("#bottom", Static)
 
-        total = max(0, node.size_bytes)
-        items: list[Node] = []
-
-        def collect(n: Node) -> None:
-            for child in n.children:
-                items.append(child)
-                if child.is_dir:
-                    collect(child)
-
-        collect(node)
-        items.sort(key=lambda n: n.size_bytes, reverse=True)
-        items = items[: self._config.largest_items]
+        weight = self._weight()
+        total = max(0, node.size_bytes) if weight is None else weight(node)
+        items = largest_nodes(node, max_items=self._config.largest_items, weight=weight)
 
         table = Table(title="Largest", show_header=True, header_style="bold")
         table.add_column("Path", overflow="fold")
@@ -172,8 +342,10 @@ class MezDiskApp(App[None]):
         table.add_column("%", justify="right")
 
         for item in items:
-            pct = 0.0 if total <= 0 else (item.size_bytes / total) * 100
-            table.add_row(str(item.path), format_bytes(item.size_bytes), f"{pct:4.1f}")
+            size = item.size_bytes if weight is None else weight(item)
+            pct = 0.0 if total <= 0 else (size / total) * 100
+            shown = format_size(item) if weight is None else format_bytes(size)
+            table.add_row(str(item.path), shown, f"{pct:4.1f}")
 
         widget.update(table)
 
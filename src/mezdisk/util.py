@@ -1,19 +1,30 @@
 from __future__ import annotations
 
 import heapq
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass
-from itertools import count
+from itertools import count, islice
 
 from rich.filesize import decimal
 
+from .age import age_days, first_bucket_at_least
 from .models import Node
 
+Weight = Callable[[Node], int]
+
 
 def format_bytes(size_bytes: int) -> str:
     return decimal(size_bytes)
 
 
+def format_size(node: Node) -> str:
+    """`format_bytes` for a node, marking sampled estimates as "≈size ±margin"."""
+
+    if node.estimated:
+        return f"≈{decimal(node.size_bytes)} ±{decimal(node.margin_bytes)}"
+    return decimal(node.size_bytes)
+
+
 def iter_leaf_files(node: Node) -> Iterator[Node]:
     stack = [node]
     while stack:
@@ -24,44 +35,159 @@ def iter_leaf_files(node: Node) -> Iterator[Node]:
         yield current
 
 
-def largest_leaf_files(node: Node, *, max_items: int) -> tuple[list[Node], int]:
+def _size_key(node: Node) -> int:
+    return max(0, node.size_bytes)
+
+
+def largest_children(node: Node, *, max_items: int) -> tuple[list[Node], int, int]:
+    """Return the `max_items` largest direct children of `node`, largest first.
+
+    Returns (selected, rest_count, rest_size_bytes) for the children that were left out.
+    """
+
+    selected = heapq.nlargest(max(0, max_items), node.children, key=_size_key)
+    rest_count = len(node.children) - len(selected)
+    rest_size = 0
+    if rest_count:
+        rest_size = max(0, sum(_size_key(c) for c in node.children) - sum(map(_size_key, selected)))
+    return selected, rest_count, rest_size
+
+
+def iter_largest_first(
+    node: Node, *, fanout: int | None = None, weight: Weight | None = None
+) -> Iterator[Node]:
+    """Yield `node` and its descendants in decreasing size order.
+
+    A subtree is never larger than its root, so this is a best-first walk that only
+    expands what the caller actually consumes. With `fanout`, only that many of the
+    largest children of each directory are considered, which is still exact as long
+    as the caller stops after at most `fanout` items.
+
+    `weight` replaces the size (e.g. an owner's bytes); it must not grow from a
+    directory to its children. Descendants with zero weight are skipped.
+    """
+
+    key = weight or _size_key
+    counter = count()
+    heap: list[tuple[int, int, Node]] = [(-key(node), next(counter), node)]
+    while heap:
+        _, _, current = heapq.heappop(heap)
+        yield current
+        if current.is_dir and current.children:
+            children = current.children
+            if fanout is not None and len(children) > fanout:
+                children = heapq.nlargest(fanout, children, key=key)
+            for child in children:
+                w = key(child)
+                if weight is not None and w <= 0:
+                    continue
+                heapq.heappush(heap, (-w, next(counter), child))
+
+
+def largest_nodes(node: Node, *, max_items: int, weight: Weight | None = None) -> list[Node]:
+    """Return the largest files and directories beneath `node` (excluding `node`)."""
+
+    if max_items <= 0:
+        return []
+    largest = iter_largest_first(node, fanout=max_items, weight=weight)
+    return list(islice(largest, 1, max_items + 1))
+
+
+def largest_leaf_files(
+    node: Node, *, max_items: int, weight: Weight | None = None
+) -> tuple[list[Node], int]:
     """Return the largest leaf files beneath `node`.
 
     Returns (selected_files, other_size_bytes) where `other_size_bytes` is the total
     size of files that did not make it into the `selected_files` list.
     """
 
-    total_size = 0
+    key = weight or _size_key
+    total_size = key(node)
     if max_items <= 0:
-        for f in iter_leaf_files(node):
-            total_size += max(0, f.size_bytes)
         return [], total_size
 
-    heap: list[tuple[int, int, Node]] = []
-    counter = count()
+    selected_files: list[Node] = []
+    for current in iter_largest_first(node, weight=weight):
+        if current.is_dir:
+            continue
+        if weight is not None and key(current) <= 0:
+            break
+        selected_files.append(current)
+        if len(selected_files) >= max_items:
+            break
+
+    selected_total = sum(map(key, selected_files))
+    other_size = max(0, total_size - selected_total)
+    return selected_files, other_size
+
 
-    for f in iter_leaf_files(node):
-        size = max(0, f.size_bytes)
-        total_size += size
+def estimated_bytes(node: Node, *, weight: Weight | None = None) -> int:
+    """Bytes beneath `node` that were extrapolated rather than scanned."""
 
-        item = (size, next(counter), f)
-        if len(heap) < max_items:
-            heapq.heappush(heap, item)
+    key = weight or _size_key
+    total = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if not current.estimated:
             continue
+        if current.children:
+            stack.extend(current.children)
+        else:
+            total += max(0, key(current))
+    return total
+
+
+def stale_files(
+    node: Node,
+    *,
+    min_age_days: float,
+    now: float,
+    max_items: int,
+    weight: Weight | None = None,
+) -> list[Node]:
+    """Return the largest files beneath `node` not modified for `min_age_days`.
+
+    Directories are expanded best-first by the bytes their age histogram puts in
+    buckets that can be that old, so subtrees with only recent data are skipped.
+    `weight` restricts the search the same way as in `iter_largest_first`.
+    """
+
+    if max_items <= 0:
+        return []
 
-        if size > heap[0][0]:
-            heapq.heapreplace(heap, item)
+    first = first_bucket_at_least(min_age_days)
 
-    selected_sorted = sorted(heap, key=lambda t: t[0], reverse=True)
-    selected_files = [t[2] for t in selected_sorted]
-    selected_total = sum(t[0] for t in heap)
+    def bound(n: Node) -> int:
+        if not n.is_dir:
+            if age_days(n.mtime, now) < min_age_days:
+                return -1
+            return _size_key(n) if weight is None else weight(n)
+        b = _size_key(n) if n.age_bytes is None else sum(n.age_bytes[first:])
+        return b if weight is None else min(b, weight(n))
 
-    other_size = max(0, total_size - selected_total)
-    return selected_files, other_size
+    counter = count()
+    heap: list[tuple[int, int, Node]] = [(-bound(node), next(counter), node)]
+    selected: list[Node] = []
+    while heap and len(selected) < max_items:
+        neg_bound, _, current = heapq.heappop(heap)
+        if neg_bound > 0:
+            break
+        if not current.is_dir:
+            selected.append(current)
+            continue
+        for child in current.children:
+            b = bound(child)
+            if b > 0:
+                heapq.heappush(heap, (-b, next(counter), child))
+    return selected
 
 
 @dataclass(frozen=True, slots=True)
 class Palette:
     dir_color: str = "bright_blue"
     error_color: str = "bright_red"
+    partial_color: str = "yellow"
+    unaccounted_color: str = "dark_orange3"
     label_dim: str = "dim"
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from mezdisk.age import AGE_BUCKET_COLORS, age_bucket
+from mezdisk.render import build_treemap_items
+from mezdisk.scan import ScanConfig, deepen_scan, scan_path
+from mezdisk.util import stale_files
+
+DAY = 86400
+
+
+def _write(path: Path, size: int, age_days: int) -> None:
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+
+
+def _make_tree(root: Path) -> None:
+    _write(root / "fresh.txt", 10, 1)
+    old = root / "old"
+    old.mkdir()
+    _write(old / "ancient.bin", 40, 1000)
+    _write(old / "recent.bin", 20, 5)
+    _write(old / "mid.bin", 30, 200)
+
+
+def test_scan_records_mtime_and_age_histogram(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    result = scan_path(tmp_path, ScanConfig())
+    root = result.root
+
+    assert root.age_bytes == [30, 0, 0, 30, 0, 40]
+    old = next(c for c in root.children if c.name == "old")
+    assert old.age_bytes == [20, 0, 0, 30, 0, 40]
+    assert old.mtime == max(c.mtime for c in old.children)
+    assert age_bucket(root.mtime, result.scanned_at) == 0
+
+
+def test_deepen_scan_rolls_up_age_histogram(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    final = list(deepen_scan(tmp_path, ScanConfig()))[-1]
+
+    assert final.root.age_bytes == scan_path(tmp_path, ScanConfig()).root.age_bytes
+
+
+def test_stale_files_returns_largest_cold_files(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    cold = stale_files(result.root, min_age_days=100, now=result.scanned_at, max_items=5)
+
+    assert [f.name for f in cold] == ["ancient.bin", "mid.bin"]
+    assert stale_files(result.root, min_age_days=5000, now=result.scanned_at, max_items=5) == []
+
+
+def test_treemap_items_colour_by_age(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    items = build_treemap_items(result.root, max_items=1, age_reference=result.scanned_at)
+
+    assert items[0].label == "old/ancient.bin"
+    assert items[0].color == AGE_BUCKET_COLORS[-1]
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from mezdisk.cli import app
+
+
+def test_path_without_subcommand_runs_scan(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_bytes(b"a" * 10)
+
+    for args in ([str(tmp_path), "--ui", "rich"], ["scan", "--ui", "rich", str(tmp_path)]):
+        result = CliRunner().invoke(app, args)
+        assert result.exit_code == 0, result.output
+        assert "Largest" in result.output
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import math
+import statistics
+from pathlib import Path
+
+from mezdisk.estimate import EstimateConfig, estimate_path, refine_estimate
+from mezdisk.render import build_treemap_items
+from mezdisk.scan import ScanConfig, scan_path
+from mezdisk.util import format_size
+
+
+def _make_tree(root: Path, *, dirs: int, size: int) -> None:
+    top = root / "top"
+    top.mkdir()
+    (root / "exact.bin").write_bytes(b"e" * 7)
+    for i in range(dirs):
+        sub = top / f"d{i:02d}"
+        sub.mkdir()
+        (sub / "f.bin").write_bytes(b"x" * size)
+
+
+def test_estimate_extrapolates_unsampled_subdirectories(tmp_path: Path) -> None:
+    _make_tree(tmp_path, dirs=20, size=100)
+
+    result = estimate_path(tmp_path, ScanConfig(), EstimateConfig(exact_depth=1, samples=4, seed=0))
+
+    top = next(c for c in result.root.children if c.name == "top")
+    assert top.estimated
+    assert sum(c.estimated for c in top.children) == 16
+    # Identical subtrees: the extrapolation is exact and the interval collapses.
+    assert result.root.size_bytes == 2007
+    assert result.root.margin_bytes == 0
+    assert result.stats.files == 5
+    assert format_size(result.root).startswith("≈")
+    assert [i.label for i in build_treemap_items(result.root, max_items=1)][-1] == "≈ Estimated"
+
+
+def test_estimate_margin_grows_with_spread(tmp_path: Path) -> None:
+    top = tmp_path / "top"
+    top.mkdir()
+    for i in range(30):
+        sub = top / f"d{i:02d}"
+        sub.mkdir()
+        (sub / "f.bin").write_bytes(b"x" * (10 + 50 * (i % 5)))
+
+    result = estimate_path(tmp_path, ScanConfig(), EstimateConfig(exact_depth=1, samples=5, seed=1))
+
+    assert result.root.estimated
+    assert result.root.margin_bytes > 0
+
+
+def test_estimate_margin_covers_each_unsampled_directory(tmp_path: Path) -> None:
+    top = tmp_path / "top"
+    top.mkdir()
+    for i in range(10):
+        sub = top / f"d{i:02d}"
+        sub.mkdir()
+        (sub / "f.bin").write_bytes(b"x" * (100 * (i + 1)))
+
+    result = estimate_path(tmp_path, ScanConfig(), EstimateConfig(exact_depth=1, samples=8, seed=2))
+
+    top_node = next(c for c in result.root.children if c.name == "top")
+    sampled = [c.size_bytes for c in top_node.children if not c.estimated]
+    unsampled = [c for c in top_node.children if c.estimated]
+    assert (len(sampled), len(unsampled)) == (8, 2)
+    z = statistics.NormalDist().inv_cdf(0.975)
+    s = statistics.stdev(sampled)
+    # Each unsampled directory gets at least z * s, and together they give the
+    # without-replacement total error z * s * sqrt(N * (N - k) / k).
+    assert all(c.margin_bytes >= z * s for c in unsampled)
+    assert math.isclose(top_node.margin_bytes, z * s * math.sqrt(10 * 2 / 8), abs_tol=2)
+
+
+def test_estimate_is_exact_when_everything_is_sampled(tmp_path: Path) -> None:
+    _make_tree(tmp_path, dirs=3, size=10)
+
+    result = estimate_path(tmp_path, ScanConfig(), EstimateConfig(exact_depth=1, samples=8))
+
+    assert not result.root.estimated
+    assert result.root.size_bytes == 37
+
+
+def test_refine_estimate_rescans_exactly(tmp_path: Path) -> None:
+    _make_tree(tmp_path, dirs=10, size=10)
+    big = tmp_path / "top" / "d09" / "big.bin"
+    big.write_bytes(b"b" * 1000)
+
+    result = estimate_path(tmp_path, ScanConfig(), EstimateConfig(exact_depth=1, samples=2, seed=3))
+    top = next(c for c in result.root.children if c.name == "top")
+    refined = refine_estimate(result, top, ScanConfig())
+
+    exact = scan_path(tmp_path, ScanConfig())
+    assert not refined.root.estimated
+    assert refined.root.size_bytes == exact.root.size_bytes
+    assert refined.stats == exact.stats
+
+
+def test_estimate_out_of_budget_is_partial(tmp_path: Path) -> None:
+    for i in range(50):
+        (tmp_path / f"f{i:02d}.bin").write_bytes(b"x")
+
+    cut = estimate_path(tmp_path, ScanConfig(max_entries=5), EstimateConfig())
+    assert cut.root.incomplete
+    assert cut.root.size_bytes == 5
+
+    expired = estimate_path(tmp_path, ScanConfig(deadline_s=0), EstimateConfig())
+    assert expired.root.incomplete
+    assert expired.root.size_bytes == 0
+
+
+def test_refine_keeps_a_truncated_ancestor_partial(tmp_path: Path) -> None:
+    _make_tree(tmp_path, dirs=4, size=10)
+    result = scan_path(tmp_path, ScanConfig(max_depth=1))
+    # As if the budget had also cut the root's own listing short.
+    result.root.truncated = result.root.incomplete = True
+    top = next(c for c in result.root.children if c.name == "top")
+
+    refined = refine_estimate(result, top, ScanConfig())
+
+    assert not top.incomplete
+    assert top.size_bytes == 40
+    assert refined.root.incomplete
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from typer.testing import CliRunner
+
+from mezdisk.cli import app
+from mezdisk.mounts import MountEntry, mount_for, read_mount_table, reconcile
+from mezdisk.owners import OwnerFilter
+from mezdisk.render import build_treemap_items
+from mezdisk.scan import ScanConfig, scan_path
+
+
+def test_read_mount_table_unescapes_paths(tmp_path: Path) -> None:
+    table = tmp_path / "mounts"
+    table.write_text(
+        "/dev/sda1 / ext4 rw,relatime 0 0\n"
+        "proc /proc proc rw 0 0\n"
+        "/dev/sdb1 /mnt/my\\040disk xfs rw 0 0\n"
+    )
+
+    entries = read_mount_table(table)
+
+    assert [e.mount_point for e in entries] == [Path("/"), Path("/proc"), Path("/mnt/my disk")]
+    assert [e.is_pseudo for e in entries] == [False, True, False]
+    assert mount_for(Path("/mnt/my disk/a/b"), entries) == entries[2]
+    assert mount_for(Path("/mnt/other"), entries) == entries[0]
+
+
+def test_reconcile_leaves_out_nested_mounts(tmp_path: Path) -> None:
+    (tmp_path / "a.bin").write_bytes(b"a" * 10)
+    # Sparse: a large apparent size with (almost) nothing allocated.
+    with open(tmp_path / "sparse.bin", "wb") as f:
+        f.truncate(1 << 30)
+    inner = tmp_path / "inner"
+    inner.mkdir()
+    (inner / "b.bin").write_bytes(b"b" * 25)
+    table = [
+        MountEntry(device="/dev/sda1", mount_point=Path("/"), fs_type="ext4"),
+        MountEntry(device="/dev/sdb1", mount_point=tmp_path, fs_type="ext4"),
+        MountEntry(device="tmpfs", mount_point=inner, fs_type="tmpfs"),
+    ]
+    result = scan_path(tmp_path, ScanConfig())
+
+    rec = reconcile(result, table)
+
+    assert rec is not None
+    assert rec.usage.mount == table[1]
+    # Allocated space, which is what the filesystem counts as used, not apparent sizes.
+    allocated = sum(os.stat(tmp_path / n).st_blocks * 512 for n in ("a.bin", "sparse.bin"))
+    assert rec.scanned_bytes == allocated
+    assert result.root.size_bytes == 10 + (1 << 30) + 25
+    st = os.statvfs(tmp_path)
+    assert rec.usage.used_bytes == (st.f_blocks - st.f_bfree) * st.f_frsize
+    assert rec.unaccounted_bytes == rec.usage.used_bytes - allocated
+    # A subdirectory of a filesystem cannot explain its usage.
+    assert reconcile(scan_path(inner, ScanConfig()), table[:2]) is None
+
+
+def test_unaccounted_space_gets_its_own_treemap_block(tmp_path: Path) -> None:
+    (tmp_path / "a.bin").write_bytes(b"a" * 10)
+    with open(tmp_path / "sparse.bin", "wb") as f:
+        f.truncate(1 << 30)
+    root = scan_path(tmp_path, ScanConfig()).root
+
+    # Unaccounted space is allocated space, so every block is sized on that basis
+    # and the (almost) unallocated sparse file barely shows.
+    items = build_treemap_items(root, max_items=5, unaccounted_bytes=90)
+    allocated = {n: os.stat(tmp_path / n).st_blocks * 512 for n in ("a.bin", "sparse.bin")}
+    assert {i.label: i.value for i in items[:-1]} == {n: b for n, b in allocated.items() if b}
+    assert (items[-1].label, items[-1].value) == ("? Unaccounted", 90.0)
+
+    mine = OwnerFilter(uid=os.getuid())
+    items = build_treemap_items(root, max_items=5, owner=mine, unaccounted_bytes=90)
+    assert [i.label for i in items] == ["sparse.bin", "a.bin"]
+
+
+def test_cli_mounts_lists_root_filesystem() -> None:
+    out = CliRunner().invoke(app, ["mounts"], env={"COLUMNS": "200"})
+    assert out.exit_code == 0, out.output
+    assert "Use%" in out.output
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from mezdisk.models import owner_key
+from mezdisk.owners import OwnerFilter, usage_by_owner
+from mezdisk.render import build_treemap_items
+from mezdisk.scan import ScanConfig, scan_path
+from mezdisk.util import largest_nodes
+
+
+def _make_tree(root: Path) -> None:
+    (root / "a.txt").write_bytes(b"a" * 10)
+    sub = root / "sub"
+    sub.mkdir()
+    (sub / "b.bin").write_bytes(b"b" * 25)
+
+
+def test_scan_records_owner_and_rolls_up_totals(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    uid, gid = os.getuid(), os.getgid()
+
+    root = scan_path(tmp_path, ScanConfig()).root
+
+    files = {c.name: c for c in root.children}
+    assert (files["a.txt"].uid, files["a.txt"].gid) == (uid, gid)
+    assert root.owner_bytes == {owner_key(uid, gid): 35}
+    assert usage_by_owner(root) == [(uid, 35)]
+    assert usage_by_owner(root, by_group=True) == [(gid, 35)]
+
+
+def test_owner_filter_restricts_treemap_and_largest(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    root = scan_path(tmp_path, ScanConfig()).root
+    # Pretend another user owns a.txt.
+    a = next(c for c in root.children if c.name == "a.txt")
+    a.uid = 4242
+    root.owner_bytes = None
+    root.rollup(0.0)
+
+    mine = OwnerFilter(uid=os.getuid())
+    theirs = OwnerFilter(uid=4242)
+
+    assert mine.weight(root) == 25
+    assert [n.name for n in largest_nodes(root, max_items=5, weight=theirs.weight)] == ["a.txt"]
+    items = build_treemap_items(root, max_items=5, owner=mine)
+    assert [(i.label, i.value) for i in items] == [("sub/b.bin", 25.0)]
+    assert build_treemap_items(root, max_items=5, owner=OwnerFilter(uid=1)) == []
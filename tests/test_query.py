@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from mezdisk.cli import app
+from mezdisk.models import Node
+from mezdisk.query import QueryError, filter_tree, iter_matches, largest_matches, parse_query
+from mezdisk.scan import ScanConfig, scan_path
+
+_DAY_S = 86400
+
+
+def _make_tree(root: Path) -> None:
+    logs = root / "logs"
+    logs.mkdir()
+    (logs / "app.log").write_bytes(b"a" * 3000)
+    (logs / "old.log").write_bytes(b"o" * 2000)
+    (logs / "notes.txt").write_bytes(b"n" * 500)
+    (root / "small.log").write_bytes(b"s" * 10)
+    now = time.time()
+    os.utime(logs / "old.log", (now - 90 * _DAY_S, now - 90 * _DAY_S))
+
+
+def _names(nodes: list[Node]) -> list[str]:
+    return [n.name for n in nodes]
+
+
+def test_query_terms_combine(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    # A directory is not a file with an extension.
+    (tmp_path / "archive.log").mkdir()
+    result = scan_path(tmp_path, ScanConfig())
+
+    def run(expr: str) -> list[str]:
+        query = parse_query(expr, root=tmp_path)
+        return _names(largest_matches(result.root, query, now=result.scanned_at, max_items=10))
+
+    assert run("ext:log") == ["app.log", "old.log", "small.log"]
+    assert run("*.log size>1K") == ["app.log", "old.log"]
+    assert run("ext:log age>30d") == ["old.log"]
+    assert run("type:file under:logs not name:app*") == ["old.log", "notes.txt"]
+    assert run("depth<=1 size>=5.5k") == [tmp_path.name, "logs"]
+    assert run("(ext:txt or name:small*) and depth=2") == ["notes.txt"]
+
+
+def test_age_bounds_keep_fractional_and_empty_matches(tmp_path: Path) -> None:
+    now = time.time()
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "month.log").write_bytes(b"m" * 10)
+    os.utime(logs / "month.log", (now - 30.5 * _DAY_S, now - 30.5 * _DAY_S))
+    (logs / "new.log").write_bytes(b"n" * 10)
+    (tmp_path / "old.lock").touch()
+    os.utime(tmp_path / "old.lock", (now - 400 * _DAY_S, now - 400 * _DAY_S))
+    (tmp_path / "new.txt").write_bytes(b"n")
+    result = scan_path(tmp_path, ScanConfig())
+
+    def run(expr: str) -> list[str]:
+        query = parse_query(expr, root=tmp_path)
+        return _names(largest_matches(result.root, query, now=result.scanned_at, max_items=10))
+
+    assert run("ext:log age>30d") == ["month.log"]
+    assert run("type:file age>100d") == ["old.lock"]
+    assert run("type:file age>100d size>0") == []
+
+
+def test_query_rejects_bad_expressions() -> None:
+    for expr in ("", "size>lots", "colour:red", "ext>log", "size>1G or", "(ext:log"):
+        with pytest.raises(QueryError):
+            parse_query(expr)
+
+
+def test_size_bound_skips_small_subtrees(tmp_path: Path) -> None:
+    # An inconsistent tree: the directory claims to be tiny, so a match beneath it can
+    # only be found by visiting it.
+    big = Node(path=tmp_path / "d" / "big.log", is_dir=False, size_bytes=100)
+    small_dir = Node(path=tmp_path / "d", is_dir=True, size_bytes=1, children=[big])
+    root = Node(path=tmp_path, is_dir=True, size_bytes=101, children=[small_dir])
+
+    assert list(iter_matches(root, parse_query("ext:log"), now=0)) == [(big, 2)]
+    assert list(iter_matches(root, parse_query("ext:log size>50"), now=0)) == []
+
+
+def test_filter_tree_keeps_matching_files(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    filtered = filter_tree(result.root, parse_query("ext:log size>100"), now=result.scanned_at)
+
+    assert filtered is not None
+    assert filtered.size_bytes == 5000
+    assert _names(filtered.children) == ["logs"]
+    assert sorted(_names(filtered.children[0].children)) == ["app.log", "old.log"]
+    # The original tree is untouched.
+    assert result.root.size_bytes == 5510
+    assert filter_tree(result.root, parse_query("ext:iso"), now=result.scanned_at) is None
+
+
+def test_cli_query_over_snapshot(tmp_path: Path) -> None:
+    data = tmp_path / "data"
+    data.mkdir()
+    _make_tree(data)
+    snapshot = tmp_path / "scan.json"
+
+    runner = CliRunner()
+    saved = runner.invoke(app, [str(data), "--ui", "rich", "--save-snapshot", str(snapshot)])
+    assert saved.exit_code == 0, saved.output
+
+    out = runner.invoke(app, ["query", "ext:log age>30d", "--snapshot", str(snapshot), "--json"])
+    assert out.exit_code == 0, out.output
+    rows = [json.loads(line) for line in out.output.splitlines()]
+    assert [(r["path"], r["size_bytes"]) for r in rows] == [(str(data / "logs" / "old.log"), 2000)]
+
+    bad = runner.invoke(app, ["query", "size>>1", "--snapshot", str(snapshot)])
+    assert bad.exit_code != 0
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from rich.console import Console
+
+from mezdisk.render import build_top_table, build_tree
+from mezdisk.scan import ScanConfig, scan_path
+from mezdisk.util import largest_leaf_files, largest_nodes
+
+
+def _render(renderable: object) -> str:
+    console = Console(width=120, record=True)
+    console.print(renderable)
+    return console.export_text()
+
+
+def _make_wide_tree(root: Path) -> None:
+    for i in range(1, 11):
+        (root / f"f{i:02d}.bin").write_bytes(b"x" * i)
+    sub = root / "sub"
+    sub.mkdir()
+    (sub / "big.bin").write_bytes(b"b" * 100)
+    (sub / "small.bin").write_bytes(b"s" * 1)
+
+
+def test_build_tree_honours_max_children(tmp_path: Path) -> None:
+    _make_wide_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    tree = build_tree(result.root, total=result.root.size_bytes, max_depth=4, max_children=3)
+    text = _render(tree)
+
+    assert "sub" in text
+    assert "f10.bin" in text
+    assert "f09.bin" in text
+    assert "f01.bin" not in text
+    # 11 root children: 3 shown, the other 8 (1..8 bytes) aggregated.
+    assert "… 8 more  36 bytes" in text
+
+
+def test_build_tree_respects_row_budget(tmp_path: Path) -> None:
+    _make_wide_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    tree = build_tree(result.root, total=result.root.size_bytes, max_depth=4, max_rows=3)
+    text = _render(tree)
+
+    assert "sub" in text
+    assert "big.bin" not in text
+    assert "… 9 more" in text
+
+
+def test_largest_nodes_matches_full_sort(tmp_path: Path) -> None:
+    _make_wide_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    everything = []
+    stack = list(result.root.children)
+    while stack:
+        n = stack.pop()
+        everything.append(n.size_bytes)
+        stack.extend(n.children)
+
+    top = largest_nodes(result.root, max_items=5)
+    assert [n.size_bytes for n in top] == sorted(everything, reverse=True)[:5]
+    assert "sub" in _render(build_top_table(result.root, total=result.root.size_bytes, max_rows=5))
+
+
+def test_largest_leaf_files_looks_past_large_directories(tmp_path: Path) -> None:
+    for d in ("a", "b"):
+        (tmp_path / d).mkdir()
+        for i in range(5):
+            (tmp_path / d / f"{i}.txt").write_bytes(b"x" * 10)
+    (tmp_path / "solo.bin").write_bytes(b"s" * 30)
+    result = scan_path(tmp_path, ScanConfig())
+
+    selected, other = largest_leaf_files(result.root, max_items=1)
+
+    assert [f.name for f in selected] == ["solo.bin"]
+    assert other == 100
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import time
 from pathlib import Path
 
-from mezdisk.scan import ScanConfig, scan_path
+from mezdisk.scan import ScanConfig, deepen_scan, scan_path
 
 
 def test_scan_path_sums_file_sizes(tmp_path: Path) -> None:
@@ -29,3 +30,91 @@ def test_scan_depth_limit(tmp_path: Path) -> None:
     # Depth 0 means: scan root directory entries are not traversed.
     assert result.root.is_dir
     assert result.root.size_bytes == 0
+    assert result.root.incomplete
+
+
+def test_scan_depth_limit_flags_unscanned_dirs(tmp_path: Path) -> None:
+    (tmp_path / "top.txt").write_bytes(b"t" * 5)
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "deep.txt").write_bytes(b"x" * 100)
+
+    result = scan_path(tmp_path, ScanConfig(max_depth=1))
+
+    by_name = {c.name: c for c in result.root.children}
+    assert by_name["sub"].incomplete
+    assert not by_name["top.txt"].incomplete
+    assert result.root.incomplete
+    assert result.root.size_bytes == 5
+
+
+def test_scan_entry_budget_returns_partial_result(tmp_path: Path) -> None:
+    for i in range(10):
+        (tmp_path / f"f{i}.bin").write_bytes(b"x" * 10)
+
+    result = scan_path(tmp_path, ScanConfig(max_entries=4))
+
+    assert result.root.incomplete
+    assert len(result.root.children) == 4
+    assert result.root.size_bytes == 40
+    # Re-totalling a budget-cut directory must not make it look complete.
+    result.root.rollup(result.scanned_at)
+    assert result.root.incomplete
+
+
+def test_scan_expired_deadline_returns_partial_result(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_bytes(b"a" * 10)
+
+    result = scan_path(tmp_path, ScanConfig(deadline_s=0.0))
+
+    assert result.root.incomplete
+    assert result.root.children == []
+
+
+def test_deepen_scan_is_shallow_first_then_exact(tmp_path: Path) -> None:
+    (tmp_path / "a.txt").write_bytes(b"a" * 10)
+    big = tmp_path / "big" / "nested"
+    big.mkdir(parents=True)
+    (big / "b.bin").write_bytes(b"b" * 25)
+    (tmp_path / "big" / "c.bin").write_bytes(b"c" * 5)
+
+    sizes = []
+    for final in deepen_scan(tmp_path, ScanConfig()):
+        sizes.append(final.root.size_bytes)
+
+    assert sizes == [10, 15, 40]
+    assert not final.root.incomplete
+    assert final.root.size_bytes == 40
+    assert final.stats == scan_path(tmp_path, ScanConfig()).stats
+
+
+def test_deepen_scan_stops_at_budget(tmp_path: Path) -> None:
+    deep = tmp_path / "a" / "b" / "c"
+    deep.mkdir(parents=True)
+    (deep / "x.bin").write_bytes(b"x" * 10)
+
+    final = list(deepen_scan(tmp_path, ScanConfig(max_entries=2)))[-1]
+
+    assert final.root.incomplete
+    assert final.root.size_bytes == 0
+
+
+def test_deepen_scan_of_a_wide_root_stays_linear(tmp_path: Path) -> None:
+    for i in range(2000):
+        sub = tmp_path / f"d{i}"
+        sub.mkdir()
+        (sub / "f.bin").write_bytes(b"f")
+
+    started = time.perf_counter()
+    exact = scan_path(tmp_path, ScanConfig())
+    scan_s = time.perf_counter() - started
+    started = time.perf_counter()
+    final = list(deepen_scan(tmp_path, ScanConfig()))[-1]
+    deepen_s = time.perf_counter() - started
+
+    assert not final.root.incomplete
+    assert final.root.size_bytes == exact.root.size_bytes == 2000
+    assert final.root.age_bytes == exact.root.age_bytes
+    assert final.root.owner_bytes == exact.root.owner_bytes
+    # One small scan per subdirectory, not a pass over all 2000 siblings each time.
+    assert deepen_s < 20 * scan_s + 1.0
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from pathlib import Path
+
+from mezdisk.events import DirCompleted, DirEntered, FileScanned, ScanFinished
+from mezdisk.scan import ScanConfig, aiter_scan, iter_scan
+
+
+def _make_tree(root: Path) -> None:
+    (root / "a.txt").write_bytes(b"a" * 10)
+    sub = root / "sub"
+    sub.mkdir()
+    (sub / "b.bin").write_bytes(b"b" * 25)
+
+
+def test_iter_scan_emits_structured_events(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    events = list(iter_scan(tmp_path, ScanConfig()))
+
+    assert isinstance(events[0], DirEntered)
+    assert events[0].path == tmp_path
+    assert isinstance(events[-1], ScanFinished)
+    assert events[-1].result.root.size_bytes == 35
+
+    completed = {e.node.name: e.node.size_bytes for e in events if isinstance(e, DirCompleted)}
+    assert completed == {tmp_path.name: 35, "sub": 25}
+
+    scanned = sorted((e.node.name, e.depth) for e in events if isinstance(e, FileScanned))
+    assert scanned == [("a.txt", 1), ("b.bin", 2)]
+
+
+def test_iter_scan_can_skip_file_events(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    events = list(iter_scan(tmp_path, ScanConfig(), file_events=False))
+
+    assert not any(isinstance(e, FileScanned) for e in events)
+    assert isinstance(events[-1], ScanFinished)
+
+
+def test_iter_scan_can_be_abandoned_early(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    events = iter_scan(tmp_path, ScanConfig())
+    assert isinstance(next(events), DirEntered)
+    events.close()
+
+
+def test_aiter_scan_matches_sync_events(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+
+    async def collect() -> list[type]:
+        return [type(e) async for e in aiter_scan(tmp_path, ScanConfig(), batch_size=2)]
+
+    expected = [type(e) for e in iter_scan(tmp_path, ScanConfig())]
+    assert asyncio.run(collect()) == expected
+
+
+def test_aiter_scan_cancel_does_not_block_the_loop(tmp_path: Path) -> None:
+    for i in range(60):
+        (tmp_path / f"f{i}").write_bytes(b"")
+    # A slow walk: one batch of 50 takes about a second.
+    config = ScanConfig(on_visit=lambda _: time.sleep(0.02))
+
+    async def cancel_mid_batch() -> float:
+        events = aiter_scan(tmp_path, config, file_events=False, batch_size=50)
+        task = asyncio.create_task(anext(events))
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        return time.perf_counter() - start
+
+    assert asyncio.run(cancel_mid_batch()) < 0.5
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from mezdisk.cli import app
+from mezdisk.client import ScanClient, ServerError
+from mezdisk.scan import ScanConfig, scan_path
+from mezdisk.server import ScanServer, ScanService
+from mezdisk.snapshot import result_from_dict, result_to_dict
+
+
+def _make_tree(root: Path) -> None:
+    (root / "a.txt").write_bytes(b"a" * 10)
+    sub = root / "sub"
+    sub.mkdir()
+    (sub / "b.png").write_bytes(b"b" * 25)
+    (sub / "c.py").write_bytes(b"c" * 5)
+
+
+@pytest.fixture
+def served(tmp_path: Path) -> Iterator[tuple[Path, Path]]:
+    data = tmp_path / "data"
+    data.mkdir()
+    _make_tree(data)
+    socket_path = tmp_path / "mezdisk.sock"
+
+    service = ScanService(data, ScanConfig(), refresh_s=None)
+    refresher = threading.Thread(target=service.run_refresh_loop, daemon=True)
+    server = ScanServer(socket_path, service)
+    refresher.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield data, socket_path
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+        thread.join()
+
+
+def test_server_answers_queries(served: tuple[Path, Path]) -> None:
+    data, socket_path = served
+
+    with ScanClient(socket_path, timeout_s=5) as client:
+        assert client.request("size")["size_bytes"] == 40
+        assert client.request("size", path="sub")["size_bytes"] == 30
+
+        children = client.request("children", path=str(data), k=1)
+        assert [c["path"] for c in children["children"]] == [str(data / "sub")]
+        assert (children["rest_count"], children["rest_size_bytes"]) == (1, 10)
+
+        largest = client.request("largest", k=2, files_only=True)
+        assert [f["path"] for f in largest] == [str(data / "sub" / "b.png"), str(data / "a.txt")]
+
+        types = client.request("types", path="sub")
+        assert types == [
+            {"type": "image", "size_bytes": 25},
+            {"type": "code", "size_bytes": 5},
+        ]
+
+        matches = client.request("query", expr="type:file size>=10 under:sub")
+        assert [m["path"] for m in matches] == [str(data / "sub" / "b.png")]
+
+        with pytest.raises(ServerError):
+            client.request("query", expr="size>")
+        with pytest.raises(ServerError):
+            client.request("size", path="missing")
+        with pytest.raises(ServerError):
+            client.request("nope")
+        # Bad arguments get an error reply and the connection stays usable.
+        with pytest.raises(ServerError):
+            client.request("children", k=None)
+        with pytest.raises(ServerError):
+            client.request("size", path=5)
+        with pytest.raises(ServerError):
+            client.request("query", expr=None, k=-1)
+        assert client.request("size")["size_bytes"] == 40
+
+
+def test_server_replies_to_malformed_lines(served: tuple[Path, Path]) -> None:
+    _, socket_path = served
+
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.settimeout(5)
+        sock.connect(str(socket_path))
+        sock.sendall(b'not json\n\xff\n[1]\n{"op": "size"}\n')
+        reader = sock.makefile("rb")
+        replies = [json.loads(reader.readline()) for _ in range(4)]
+
+    assert [r["ok"] for r in replies] == [False, False, False, True]
+    assert replies[2]["error"] == "request must be a JSON object"
+
+
+def test_server_snapshot_and_refresh(served: tuple[Path, Path]) -> None:
+    data, socket_path = served
+
+    with ScanClient(socket_path, timeout_s=5) as client:
+        result = client.fetch_result()
+        assert result.root.path == data
+        assert result.root.size_bytes == 40
+        generation = client.request("status")["generation"]
+
+        (data / "new.bin").write_bytes(b"n" * 60)
+        client.request("refresh")
+        deadline = time.monotonic() + 5
+        while client.request("status")["generation"] == generation:
+            assert time.monotonic() < deadline, "refresh never rescanned"
+            time.sleep(0.01)
+        assert client.request("size")["size_bytes"] == 100
+
+
+def test_snapshot_round_trip(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    result = scan_path(tmp_path, ScanConfig())
+
+    assert result_from_dict(result_to_dict(result)) == result
+
+
+def test_server_refuses_live_socket(served: tuple[Path, Path]) -> None:
+    data, socket_path = served
+
+    with pytest.raises(OSError, match="already listening"):
+        ScanServer(socket_path, ScanService(data, ScanConfig(), refresh_s=None))
+
+
+def test_cli_connect_renders_served_scan(served: tuple[Path, Path]) -> None:
+    data, socket_path = served
+
+    result = CliRunner().invoke(app, ["--connect", str(socket_path), "--ui", "rich"])
+
+    assert result.exit_code == 0, result.output
+    assert f"Path: {data}" in result.output
+
+
+def test_refresh_during_a_scan_is_not_lost(tmp_path: Path) -> None:
+    _make_tree(tmp_path)
+    scanning = threading.Event()
+    release = threading.Event()
+
+    def on_visit(_: Path) -> None:
+        scanning.set()
+        release.wait(5)
+
+    service = ScanService(tmp_path, ScanConfig(on_visit=on_visit), refresh_s=None)
+    refresher = threading.Thread(target=service.run_refresh_loop, daemon=True)
+    refresher.start()
+    try:
+        assert scanning.wait(5)
+        service.handle({"op": "refresh"})
+        release.set()
+        deadline = time.monotonic() + 5
+        while service.handle({"op": "status"})["generation"] < 2:
+            assert time.monotonic() < deadline, "refresh sent mid-scan was dropped"
+            time.sleep(0.01)
+    finally:
+        release.set()
+        service.stop()
+        refresher.join(5)
+
+
+def test_server_will_not_replace_a_regular_file(tmp_path: Path) -> None:
+    notes = tmp_path / "notes.txt"
+    notes.write_text("keep me")
+    service = ScanService(tmp_path, ScanConfig(), refresh_s=None)
+
+    with pytest.raises(OSError, match="not a socket"):
+        ScanServer(notes, service)
+    assert notes.read_text() == "keep me"
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Import cost of mezdisk.cli on top of typer itself, best of a few runs. Textual alone
+# is well over this, so importing a UI toolkit eagerly again trips it.
+STARTUP_BUDGET_US = 150_000
+
+DEFERRED_MODULES = (
+    "textual",
+    "rich.layout",
+    "rich.progress",
+    "mezdisk.tui",
+    "mezdisk.render",
+    "mezdisk.estimate",
+    "mezdisk.client",
+    "mezdisk.server",
+    "mezdisk.query",
+    "mezdisk.snapshot",
+    "mezdisk.mounts",
+    "json",
+)
+
+
+def _python(*args: str) -> subprocess.CompletedProcess[str]:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    return subprocess.run(
+        [sys.executable, *args], env=env, capture_output=True, text=True, check=True
+    )
+
+
+def _cumulative_import_us(module: str) -> dict[str, int]:
+    stderr = _python("-X", "importtime", "-c", f"import {module}").stderr
+    times: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_defers_ui_toolkits() -> None:
+    code = f"import sys, mezdisk.cli\nprint(*[m for m in {DEFERRED_MODULES!r} if m in sys.modules])"
+    assert _python("-c", code).stdout.strip() == ""
+
+
+def test_cli_import_time_budget() -> None:
+    samples = []
+    for _ in range(3):
+        times = _cumulative_import_us("mezdisk.cli")
+        samples.append(times["mezdisk.cli"] - times.get("typer", 0))
+    assert min(samples) < STARTUP_BUDGET_US, f"mezdisk.cli import took {min(samples)}us"
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from mezdisk import cli
+from mezdisk.cli import app
+from mezdisk.events import ScanFinished, ScanProgress
+from mezdisk.scan import ScanConfig, iter_scan, scan_path
+from mezdisk.throttle import Throttle
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_throttle_paces_to_the_cap() -> None:
+    clock = _FakeClock()
+    throttle = Throttle(100, clock=clock, sleep=clock.sleep)
+
+    for _ in range(200):
+        throttle.record(throttle.acquire())
+
+    # 200 ops at 100/s, less the small initial burst.
+    assert 1.9 <= clock.now <= 2.0
+    assert throttle.rate == 100
+
+
+def test_throttle_backs_off_while_latency_is_high_and_recovers() -> None:
+    clock = _FakeClock()
+    throttle = Throttle(1000, clock=clock, sleep=clock.sleep)
+
+    def run(ops: int, latency_s: float) -> None:
+        for _ in range(ops):
+            started = throttle.acquire()
+            clock.now += latency_s
+            throttle.record(started)
+
+    run(500, 0.0001)
+    assert throttle.rate == 1000
+
+    run(200, 0.01)
+    slowed = throttle.rate
+    assert slowed < 100
+
+    run(2000, 0.0001)
+    assert throttle.rate > slowed
+
+
+def test_throttled_scan_reports_rate_and_matches_full_scan(tmp_path: Path) -> None:
+    for i in range(40):
+        (tmp_path / f"f{i}.bin").write_bytes(b"x" * i)
+    config = ScanConfig(max_ops_per_s=200)
+
+    start = time.perf_counter()
+    events = list(iter_scan(tmp_path, config, file_events=False))
+    elapsed = time.perf_counter() - start
+
+    finished = events[-1]
+    assert isinstance(finished, ScanFinished)
+    assert finished.result.root.size_bytes == scan_path(tmp_path, ScanConfig()).root.size_bytes
+    # 41 syscalls (one listing, 40 stats) at 200/s.
+    assert elapsed >= 0.15
+    progress = [e for e in events if isinstance(e, ScanProgress)]
+    assert progress
+    assert all(e.limit_per_s is not None and e.entries_per_s < 400 for e in progress)
+
+
+def test_lower_priority_in_a_child_process() -> None:
+    code = (
+        "import os; from mezdisk.throttle import lower_priority; "
+        "print(','.join(lower_priority())); print(os.getpriority(os.PRIO_PROCESS, 0))"
+    )
+    src = Path(__file__).resolve().parents[1] / "src"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "PYTHONPATH": str(src)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    applied, priority = out.stdout.splitlines()
+    assert "nice 19" in applied.split(",")
+    assert priority == "19"
+
+
+def test_cli_warns_when_priority_cannot_be_lowered(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(cli, "lower_priority", lambda: [])
+
+    result = CliRunner().invoke(app, [str(tmp_path), "--ui", "rich", "--low-priority"])
+
+    assert result.exit_code == 0, result.output
+    assert "could not lower the process priority" in result.output